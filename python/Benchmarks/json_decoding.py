@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import getopt
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from python.common import json_stream
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_observation(index):
+    return {
+        'id': '00000000-0000-0000-0000-{0:012d}'.format(index),
+        'customId': 'OBS-{0}'.format(index),
+        'samplingLocation': {'id': 'loc-{0}'.format(index % 50), 'customId': 'Location {0}'.format(index % 50)},
+        'observedProperty': {'id': 'op-{0}'.format(index % 12), 'customId': 'Ammonia'},
+        'activity': {'id': 'act-{0}'.format(index // 10), 'customId': 'Sample {0}'.format(index // 10)},
+        'observedTime': '2014-10-29T09:{0:02d}:00.000-07:00'.format(index % 60),
+        'numericResult': {'value': index * 0.25, 'unit': {'customId': 'mg/l'}, 'detectionCondition': None},
+        'dataClassification': 'LAB',
+        'resultStatus': 'PRELIMINARY',
+        'resultGrade': 'OK',
+        'comment': 'Created by AQSRestClient benchmark'
+    }
+
+
+def write_payload(path, observation_count):
+    with open(path, 'w') as payload_file:
+        payload_file.write('{"totalCount": %d, "domainObjects": [' % observation_count)
+        for index in range(observation_count):
+            if index > 0:
+                payload_file.write(',')
+            payload_file.write(json.dumps(make_observation(index)))
+        payload_file.write('], "cursor": null}')
+
+
+def iter_file(path):
+    with open(path, 'rb') as payload_file:
+        while True:
+            chunk = payload_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+# Each mode mimics how a response body is handled: read in CHUNK_SIZE pieces, then decoded
+def run_mode(mode, path):
+    started = time.perf_counter()
+    count = 0
+    if mode == 'text':
+        content = b''.join(iter_file(path))
+        count = len(json.loads(content.decode('utf-8'))['domainObjects'])
+    elif mode == 'backend':
+        content = b''.join(iter_file(path))
+        count = len(json_stream.loads(content)['domainObjects'])
+    elif mode == 'stream':
+        for _ in json_stream.JsonObjectStream(iter_file(path)):
+            count += 1
+    elapsed = time.perf_counter() - started
+    return count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, path):
+    output = subprocess.check_output([sys.executable, '-m', 'python.Benchmarks.json_decoding', '--run', mode, path])
+    count, elapsed, max_rss = output.decode().split()
+    return int(count), float(elapsed), int(max_rss)
+
+
+def main():
+    observation_count = 200000
+    opts, args = getopt.getopt(sys.argv[1:], '', ['observations=', 'run='])
+    for opt, arg in opts:
+        if opt == '--observations':
+            observation_count = int(arg)
+        elif opt == '--run':
+            print('%d %f %d' % run_mode(arg, args[0]))
+            return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'observations.json')
+        write_payload(path, observation_count)
+        print('payload: {0} observations, {1:.1f} MB, JSON backend: {2}'.format(
+            observation_count, os.path.getsize(path) / 1e6, json_stream.JSON_BACKEND))
+
+        _, _, base_rss = measure('none', path)
+        print('{0:<10}{1:>12}{2:>12}{3:>20}'.format('mode', 'objects', 'seconds', 'peak RSS delta (MB)'))
+        for mode in ('text', 'backend', 'stream'):
+            count, elapsed, max_rss = measure(mode, path)
+            print('{0:<10}{1:>12}{2:>12.3f}{3:>20.1f}'.format(mode, count, elapsed, (max_rss - base_rss) / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
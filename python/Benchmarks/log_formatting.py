@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import getopt
+import logging
+import sys
+import time
+
+from python.common.common_logging import CommonLoggingFormatter
+
+VERBOSE_FORMAT = '%(asctime)s [%(process)d-%(thread)d] %(levelname)s %(name)s : %(message)s'
+
+
+# Records spread over a few seconds, like a busy client writes them
+def make_records(record_count):
+    records = []
+    started = time.time()
+    for index in range(record_count):
+        record = logging.LogRecord('AQSRestClient.RestClient', logging.DEBUG, __file__, 0, 'get: %s',
+                                   ('https://example.aqsamples.com/api/v1/fieldvisits?customId=FV_{0}'.format(index),),
+                                   None)
+        record.created = started + index * 0.0001
+        record.msecs = (record.created - int(record.created)) * 1000
+        records.append(record)
+    return records
+
+
+def measure(formatter, records, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            formatter.format(record)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    record_count = 100000
+    repeat = 5
+    opts, args = getopt.getopt(sys.argv[1:], '', ['records=', 'repeat='])
+    for opt, arg in opts:
+        if opt == '--records':
+            record_count = int(arg)
+        elif opt == '--repeat':
+            repeat = int(arg)
+
+    records = make_records(record_count)
+    formatters = (
+        ('logging.Formatter', logging.Formatter(VERBOSE_FORMAT)),
+        ('CommonLogging', CommonLoggingFormatter()),
+        ('CommonLogging json', CommonLoggingFormatter(json_lines=True)),
+    )
+    print('{0} records, best of {1}'.format(record_count, repeat))
+    print('{0:<22}{1:>12}{2:>14}'.format('formatter', 'seconds', 'ns/record'))
+    for name, formatter in formatters:
+        elapsed = measure(formatter, records, repeat)
+        print('{0:<22}{1:>12.3f}{2:>14.0f}'.format(name, elapsed, elapsed / record_count * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import getopt
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from python import CommonLogging
+
+MODES = (
+    ('disabled', {}),
+    ('sync', {'log_file': True}),
+    ('async', {'log_file': True, 'async_logging': True}),
+    ('async+truncate', {'log_file': True, 'async_logging': True, 'max_message_length': 200}),
+    ('async+sampled', {'log_file': True, 'async_logging': True, 'debug_sample_rate': 0.1}),
+)
+
+
+def make_payload():
+    return {
+        'customId': 'AqtsConnectorLoc1_FV_001',
+        'samplingLocation': {'id': '00000000-0000-0000-0000-000000000001', 'customId': 'AqtsConnectorLoc1'},
+        'notes': 'x' * 4000
+    }
+
+
+# The log calls RestClient and SampleClient make for one request
+def log_requests(logger, request_count, payload):
+    for index in range(request_count):
+        logger.debug('get: %s', 'https://example.aqsamples.com/api/v1/fieldvisits?customId=FV_{0}'.format(index))
+        logger.debug('Posted FieldVisit %s', payload)
+
+
+def run_mode(temp_dir, name, options, thread_count, request_count):
+    log_filename = os.path.join(temp_dir, name + '.log') if options.get('log_file', False) else None
+    CommonLogging.configure(log_filename, log_file_level=logging.DEBUG, log_console=False,
+                            async_logging=options.get('async_logging', False),
+                            debug_sample_rate=options.get('debug_sample_rate', None),
+                            max_message_length=options.get('max_message_length', None))
+    logger = CommonLogging.get_logger('Benchmark')
+    payload = make_payload()
+    threads = [threading.Thread(target=log_requests, args=(logger, request_count, payload))
+               for _ in range(thread_count)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    CommonLogging.stop_listeners()
+    drained = time.perf_counter() - started
+    log_size = os.path.getsize(log_filename) if log_filename is not None else 0
+    return elapsed, drained, log_size
+
+
+def main():
+    thread_count = 8
+    request_count = 5000
+    output_filename = None
+    opts, args = getopt.getopt(sys.argv[1:], '', ['threads=', 'requests=', 'json='])
+    for opt, arg in opts:
+        if opt == '--threads':
+            thread_count = int(arg)
+        elif opt == '--requests':
+            request_count = int(arg)
+        elif opt == '--json':
+            output_filename = arg
+
+    total_requests = thread_count * request_count
+    print('{0} threads x {1} requests, 2 debug lines per request'.format(thread_count, request_count))
+    print('{0:<16}{1:>12}{2:>14}{3:>22}{4:>14}{5:>12}'.format(
+        'mode', 'seconds', 'us/request', 'overhead (us/request)', 'drained (s)', 'log (MB)'))
+    results = {}
+    baseline = None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, options in MODES:
+            elapsed, drained, log_size = run_mode(temp_dir, name, options, thread_count, request_count)
+            if baseline is None:
+                baseline = elapsed
+            per_request = elapsed / total_requests * 1e6
+            overhead = (elapsed - baseline) / total_requests * 1e6
+            results[name] = {'seconds': elapsed, 'drained_seconds': drained, 'log_bytes': log_size,
+                             'microseconds_per_request': per_request, 'overhead_microseconds_per_request': overhead}
+            print('{0:<16}{1:>12.3f}{2:>14.2f}{3:>22.2f}{4:>14.3f}{5:>12.1f}'.format(
+                name, elapsed, per_request, overhead, drained, log_size / 1e6))
+
+    if output_filename is not None:
+        with open(output_filename, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
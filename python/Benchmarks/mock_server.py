@@ -0,0 +1,308 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import csv
+import email.parser
+import email.policy
+import getopt
+import gzip
+import hashlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LIST_PATHS = ('samplinglocations', 'fieldvisits', 'activities', 'observations', 'observedproperties',
+              'exchangeconfigurations', 'collectionmethods', 'units')
+OBSERVED_PROPERTIES = ('Ammonia', 'Battery Voltage', 'Chlorophyll a', 'DO (Concentration)', 'DO (Saturation)', 'ORP',
+                       'pH', 'Specific conductance', 'Temperature', 'Total Dissolved Solids',
+                       'Total suspended solids', 'Turbidity')
+# Search parameters the client sends and the field of a domain object each one filters on
+FILTERS = {
+    'customId': ('customId',),
+    'samplingLocationIds': ('samplingLocation', 'id'),
+    'fieldVisitId': ('fieldVisit', 'id'),
+    'activityId': ('activity', 'id'),
+    'type': ('type',)
+}
+
+
+# In-memory stand-in for the AQUARIUS Samples endpoints SampleClient uses: status, CRUD and searches on the domain
+# object lists, and the observation / vertical profile imports. Every response can be delayed by latency seconds
+# (plus up to jitter), fail with error_status at error_rate, and searches return at most max_page_size objects,
+# paged with a cursor or, with pagination='offset', by start/totalCount only. GET responses carry an ETag and are
+# answered with 304 when it matches If-None-Match; gzip request bodies are refused with 415 unless accept_gzip.
+# Imported rows without a numeric Result Value are reported as import errors; a row's Location ID names its sampling
+# location when the import has no samplingLocationIds.
+class MockSamplesServer(object):
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 max_page_size=1000, pagination='cursor', accept_gzip=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_page_size = max_page_size
+        self.pagination = pagination
+        self.accept_gzip = accept_gzip
+        self.lock = threading.Lock()
+        self.lists = dict((list_path, {}) for list_path in LIST_PATHS)
+        self.request_count = 0
+        self.seed()
+
+        handler = type('MockSamplesHandler', (_MockSamplesHandler,), {'mock': self})
+        self.http_server = ThreadingHTTPServer((host, port), handler)
+        self.http_server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.http_server.server_port
+
+    @property
+    def base_url(self):
+        return 'http://{0}:{1}/api/'.format(self.http_server.server_address[0], self.port)
+
+    def seed(self):
+        for custom_id in OBSERVED_PROPERTIES:
+            self.create('observedproperties', {'customId': custom_id, 'name': custom_id})
+        self.create('collectionmethods', {'customId': 'GRAB', 'name': 'Grab sample'})
+        self.create('units', {'customId': 'mg/l'})
+        self.create('exchangeconfigurations', {'type': 'AQUARIUS_TIMESERIES', 'settings': [],
+                                               'samplingLocationMappings': [], 'observationMappings': []})
+
+    def start(self):
+        self.thread = threading.Thread(target=self.http_server.serve_forever, name='MockSamplesServer', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def create(self, list_path, domain_object):
+        domain_object = dict(domain_object)
+        domain_object['id'] = domain_object.get('id', None) or str(uuid.uuid4())
+        with self.lock:
+            self.lists[list_path][domain_object['id']] = domain_object
+        return domain_object
+
+    def find(self, list_path, query):
+        with self.lock:
+            domain_objects = list(self.lists[list_path].values())
+        for name, path in FILTERS.items():
+            if name in query:
+                wanted = set(query[name])
+                domain_objects = [domain_object for domain_object in domain_objects
+                                  if _get_field(domain_object, path) in wanted]
+        return domain_objects
+
+    def search(self, list_path, query):
+        domain_objects = self.find(list_path, query)
+        limit = min(int(query.get('limit', [self.max_page_size])[0]), self.max_page_size)
+        start = int(query.get('cursor', query.get('start', ['0']))[0])
+        page = {'totalCount': len(domain_objects), 'domainObjects': domain_objects[start:start + limit]}
+        if self.pagination == 'cursor' and start + limit < len(domain_objects):
+            page['cursor'] = str(start + limit)
+        return page
+
+    def import_observations(self, query, csv_text, vertical_profile=False):
+        reader = csv.reader(io.StringIO(csv_text))
+        header = next(reader, [])
+        if vertical_profile:
+            next(reader, None)
+        sampling_location_ids = query.get('samplingLocationIds', [None])
+        activity_id = query.get('activityId', [None])[0]
+        imported = 0
+        errors = []
+        for row_number, values in enumerate(reader, start=3 if vertical_profile else 2):
+            if not values:
+                continue
+            row = dict(zip(header, values))
+            if not vertical_profile and not _is_number(row.get('Result Value', None)):
+                errors.append({'rowNumber': row_number, 'message': 'Result Value is not a number'})
+                continue
+            sampling_location_id = sampling_location_ids[0]
+            if sampling_location_id is None and row.get('Location ID', None):
+                sampling_locations = self.find('samplinglocations', {'customId': [row['Location ID']]})
+                sampling_location_id = sampling_locations[0]['id'] if sampling_locations else None
+            observation = {
+                'samplingLocation': {'id': sampling_location_id},
+                'observedProperty': {'customId': row.get('Observed Property ID', None)},
+                'observedTime': row.get('Observed DateTime', None),
+                'activity': {'id': activity_id, 'customId': row.get('Sample ID', None)},
+                'numericResult': {'value': row.get('Result Value', None)}
+            }
+            self.create('observations', observation)
+            imported += 1
+        return {'importedCount': imported, 'errorCount': len(errors), 'errors': errors}
+
+    def delete(self, list_path, query):
+        domain_objects = self.find(list_path, query)
+        with self.lock:
+            for domain_object in domain_objects:
+                self.lists[list_path].pop(domain_object['id'], None)
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _get_field(domain_object, path):
+    value = domain_object
+    for field in path:
+        value = value.get(field, None) if isinstance(value, dict) else None
+    return value
+
+
+class _MockSamplesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        mock = self.mock
+        with mock.lock:
+            mock.request_count += 1
+        body = self.read_body()
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            if not mock.accept_gzip:
+                return self.send_error_object(415, 'UNSUPPORTED_MEDIA_TYPE', 'gzip request bodies are not accepted')
+            body = gzip.decompress(body)
+        if mock.latency or mock.jitter:
+            time.sleep(mock.latency + random.uniform(0, mock.jitter))
+        if mock.error_rate and random.random() < mock.error_rate:
+            return self.send_error_object(mock.error_status, 'INJECTED', 'injected failure')
+
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        segments = url.path.strip('/').split('/')
+        if segments[:2] != ['api', 'v1'] or len(segments) < 3:
+            return self.send_error_object(404, 'NOT_FOUND', 'unknown path {0}'.format(url.path))
+        segments = segments[2:]
+
+        if segments == ['status'] and method == 'GET':
+            return self.send_json(200, {'releaseName': 'mock', 'requestCount': mock.request_count})
+        if segments[0] == 'services' and segments[1:2] == ['import'] and method == 'POST':
+            csv_text = self.get_uploaded_file(body)
+            return self.send_json(200, mock.import_observations(
+                query, csv_text, vertical_profile=segments[2:] == ['verticalprofiledata']))
+        if segments[0] not in mock.lists:
+            return self.send_error_object(404, 'NOT_FOUND', 'unknown list {0}'.format(segments[0]))
+
+        list_path = segments[0]
+        domain_object_id = segments[1] if len(segments) > 1 else None
+        if method == 'GET' and domain_object_id is None:
+            return self.send_json(200, mock.search(list_path, query))
+        if method == 'POST' and domain_object_id is None:
+            return self.send_json(200, mock.create(list_path, json.loads(body.decode('utf-8'))))
+        if method == 'DELETE' and domain_object_id is None:
+            mock.delete(list_path, query)
+            return self.send_json(204, None)
+
+        with mock.lock:
+            existing = mock.lists[list_path].get(domain_object_id, None)
+        if existing is None:
+            return self.send_error_object(404, 'NOT_FOUND', '{0} {1} does not exist'.format(list_path, domain_object_id))
+        if method == 'GET':
+            return self.send_json(200, existing)
+        if method == 'PUT':
+            domain_object = json.loads(body.decode('utf-8'))
+            domain_object['id'] = domain_object_id
+            return self.send_json(200, mock.create(list_path, domain_object))
+        with mock.lock:
+            mock.lists[list_path].pop(domain_object_id, None)
+        return self.send_json(204, None)
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length', 0) or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def get_uploaded_file(self, body):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b'Content-Type: ' + self.headers.get('Content-Type', '').encode('latin-1') + b'\r\n\r\n' + body)
+        for part in message.iter_parts():
+            if part.get_param('name', header='content-disposition') == 'file':
+                return part.get_payload(decode=True).decode('utf-8')
+        return ''
+
+    def send_json(self, status, payload):
+        content = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = '"{0}"'.format(hashlib.sha1(content).hexdigest())
+            if self.headers.get('If-None-Match', None) == etag:
+                status = 304
+                content = b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_error_object(self, status, error_code, message):
+        self.send_json(status, {'errorCode': error_code, 'message': message, 'stackTrace': ''})
+
+
+def main():
+    options = {}
+    opts, args = getopt.getopt(sys.argv[1:], '', ['host=', 'port=', 'latency=', 'jitter=', 'error-rate=',
+                                                  'error-status=', 'max-page-size=', 'pagination=',
+                                                  'reject-gzip'])
+    for opt, arg in opts:
+        if opt == '--reject-gzip':
+            options['accept_gzip'] = False
+            continue
+        name = opt[2:].replace('-', '_')
+        options[name] = arg if name in ('host', 'pagination') else \
+            int(arg) if name in ('port', 'error_status', 'max_page_size') else float(arg)
+
+    server = MockSamplesServer(**options)
+    print(server.base_url, flush=True)
+    try:
+        server.http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import gc
+import getopt
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from python.common import json_stream
+from python.common.models import Activity
+from python.common.sample_client import SampleClient
+
+CHUNK_SIZE = 64 * 1024
+MODES = ('dicts', 'models', 'models_read')
+
+
+# A search result of activities as the server returns it: every activity embeds a full copy of its field visit and
+# sampling location; activities_per_visit activities share a field visit and visits_per_location visits a location
+def write_payload(path, activity_count, activities_per_visit=10, visits_per_location=20):
+    with open(path, 'w') as payload_file:
+        payload_file.write('{"totalCount": %d, "domainObjects": [' % activity_count)
+        for index in range(activity_count):
+            visit_index = index // activities_per_visit
+            location_index = visit_index // visits_per_location
+            sampling_location = SampleClient.make_sampling_location({
+                'id': 'loc-{0}'.format(location_index), 'customId': 'Location {0}'.format(location_index)})
+            field_visit = SampleClient.make_field_visit({
+                'id': 'fv-{0}'.format(visit_index), 'customId': 'Visit {0}'.format(visit_index),
+                'samplingLocation': sampling_location})
+            activity = SampleClient.make_activity({
+                'id': 'act-{0}'.format(index), 'customId': 'Activity {0}'.format(index), 'fieldVisit': field_visit})
+            if index > 0:
+                payload_file.write(',')
+            payload_file.write(json.dumps(activity))
+        payload_file.write(']}')
+
+
+def iter_file(path):
+    with open(path, 'rb') as payload_file:
+        while True:
+            chunk = payload_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+# Holds every activity of the payload, decoded one by one as iter_domain_objects yields them: as dicts, as models,
+# or as models whose embedded objects were all read once (so decoded into their slots). Returns the seconds taken
+# and the bytes the held activities still use.
+def run_mode(mode, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == 'dicts':
+        held = list(json_stream.JsonObjectStream(iter_file(path)))
+    else:
+        shared = {}
+        held = [Activity.from_dict(activity, shared) for activity in json_stream.JsonObjectStream(iter_file(path))]
+        del shared
+        if mode == 'models_read':
+            for activity in held:
+                activity.customId
+                activity.fieldVisit.samplingLocation.customId
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(held), elapsed, retained
+
+
+# Models must give back exactly the activities of the payload
+def check_round_trip(path):
+    shared = {}
+    for activity in json_stream.JsonObjectStream(iter_file(path)):
+        model = Activity.from_dict(activity, shared)
+        if json.dumps(model.to_dict()) != json.dumps(activity):
+            raise RuntimeError('model of {0} does not serialize back to the same JSON'.format(activity['id']))
+
+
+def measure(mode, path):
+    output = subprocess.check_output([sys.executable, '-m', 'python.Benchmarks.model_memory', '--run', mode, path])
+    count, elapsed, retained = output.decode().split()
+    return int(count), float(elapsed), int(retained)
+
+
+def main():
+    activity_count = 200000
+    opts, args = getopt.getopt(sys.argv[1:], '', ['activities=', 'run='])
+    for opt, arg in opts:
+        if opt == '--activities':
+            activity_count = int(arg)
+        elif opt == '--run':
+            print('%d %f %d' % run_mode(arg, args[0]))
+            return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'activities.json')
+        write_payload(path, activity_count)
+        print('payload: {0} activities, {1:.1f} MB, JSON backend: {2}'.format(
+            activity_count, os.path.getsize(path) / 1e6, json_stream.JSON_BACKEND))
+        check_round_trip(path)
+
+        print('{0:<14}{1:>12}{2:>12}{3:>16}{4:>18}'.format('mode', 'objects', 'seconds', 'retained (MB)',
+                                                           'bytes / object'))
+        for mode in MODES:
+            count, elapsed, retained = measure(mode, path)
+            print('{0:<14}{1:>12}{2:>12.3f}{3:>16.1f}{4:>18.0f}'.format(mode, count, elapsed, retained / 1e6,
+                                                                         retained / float(count)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import getopt
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from python import CommonLogging
+from python import RestClient
+from python import SampleClient
+
+SCENARIOS = ('get_or_create', 'bulk', 'cascade', 'import')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+# Each prepare_<scenario> does the setup that is not measured and returns the measured part
+
+# get_or_create: creates `size` sampling locations one by one, then looks every one of them up again
+def prepare_get_or_create(sample_client, size):
+    def run():
+        for _ in range(2):
+            for index in range(size):
+                sample_client.get_or_create_sampling_location({'customId': 'BenchmarkLoc{0}'.format(index)})
+    return run
+
+
+# bulk: posts `size` field visits with bulk_post
+def prepare_bulk(sample_client, size):
+    sampling_location = sample_client.post_domain_object('samplinglocations', SampleClient.make_sampling_location())
+    field_visits = [SampleClient.make_field_visit({'samplingLocation': sampling_location,
+                                                   'customId': 'BenchmarkFV{0}'.format(index)})
+                    for index in range(size)]
+
+    def run():
+        if not all(bulk_result.ok for bulk_result in sample_client.bulk_post('fieldvisits', field_visits)):
+            raise RuntimeError('bulk_post failed')
+    return run
+
+
+# cascade: deletes the `size` field visits of a sampling location, with 2 activities each
+def prepare_cascade(sample_client, size):
+    sampling_location = sample_client.post_domain_object('samplinglocations', SampleClient.make_sampling_location())
+    field_visits = [bulk_result.result for bulk_result in sample_client.bulk_post('fieldvisits', [
+        SampleClient.make_field_visit({'samplingLocation': sampling_location}) for _ in range(size)])]
+    sample_client.bulk_post('activities', [SampleClient.make_activity({'fieldVisit': field_visit})
+                                           for field_visit in field_visits for _ in range(2)])
+    return lambda: sample_client.delete_field_visits_by_sampling_location_id(sampling_location['id'])
+
+
+# import: imports an observations CSV of `size` * 10 rows in chunks of `size` rows
+def prepare_import(sample_client, size):
+    sampling_location = sample_client.post_domain_object('samplinglocations', SampleClient.make_sampling_location())
+    header = 'Observation ID,Location ID,Observed Property ID,Observed DateTime,Sample ID,Result Value\n'
+    lines = [header] + [',{0},Ammonia,2014-10-29T09:{1:02d}:00.000-07:00,S{2},{3}\n'.format(
+        sampling_location['customId'], index % 60, index, index * 0.1) for index in range(size * 10)]
+
+    def run():
+        report = sample_client.import_csv_in_chunks('services/import/observations', lines, rows_per_chunk=size,
+                                                    params={'samplingLocationIds': sampling_location['id']})
+        if report['chunks']['failed']:
+            raise RuntimeError('import failed: {0}'.format(report['chunks']['failed']))
+    return run
+
+
+def run_scenario(scenario, base_url, size):
+    latencies = []
+    rest_client = RestClient(pool_maxsize=16)
+    rest_client.add_hook('after_response', lambda method, url, attempt, response, error, latency, bytes_out,
+                         reused: latencies.append(latency))
+    sample_client = SampleClient('benchmark', base_url, rest_client)
+    run = globals()['prepare_' + scenario](sample_client, size)
+    del latencies[:]
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    sample_client.close()
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    }
+
+
+def start_mock_server(server_options):
+    server = subprocess.Popen([sys.executable, '-m', 'python.Benchmarks.mock_server'] + server_options,
+                              stdout=subprocess.PIPE)
+    return server, server.stdout.readline().decode().strip()
+
+
+# Each scenario runs in its own client process against a fresh mock server process
+def measure(scenario, size, server_options):
+    server, base_url = start_mock_server(server_options)
+    try:
+        output = subprocess.check_output([sys.executable, '-m', 'python.Benchmarks.throughput', '--run', scenario,
+                                          '--size', str(size), base_url])
+    finally:
+        server.terminate()
+        server.wait()
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+# Regressions: throughput down or p99 latency up by more than tolerance compared with the baseline results
+def compare(results, baseline, tolerance):
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scenario'], None)
+        if previous is None:
+            continue
+        if result['requests_per_second'] < previous['requests_per_second'] * (1 - tolerance):
+            regressions.append('{0}: {1:.0f} requests/s, was {2:.0f}'.format(
+                result['scenario'], result['requests_per_second'], previous['requests_per_second']))
+        if result['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append('{0}: p99 {1:.2f} ms, was {2:.2f} ms'.format(
+                result['scenario'], result['p99_ms'], previous['p99_ms']))
+    return regressions
+
+
+def main():
+    size = 500
+    scenarios = SCENARIOS
+    server_options = []
+    output_filename = None
+    baseline_filename = None
+    tolerance = 0.2
+    opts, args = getopt.getopt(sys.argv[1:], '', ['run=', 'size=', 'scenarios=', 'latency=', 'jitter=',
+                                                  'error-rate=', 'max-page-size=', 'json=', 'baseline=',
+                                                  'tolerance='])
+    run = None
+    for opt, arg in opts:
+        if opt == '--run':
+            run = arg
+        elif opt == '--size':
+            size = int(arg)
+        elif opt == '--scenarios':
+            scenarios = arg.split(',')
+        elif opt in ('--latency', '--jitter', '--error-rate', '--max-page-size'):
+            server_options += [opt, arg]
+        elif opt == '--json':
+            output_filename = arg
+        elif opt == '--baseline':
+            baseline_filename = arg
+        elif opt == '--tolerance':
+            tolerance = float(arg)
+
+    if run is not None:
+        CommonLogging.configure(log_console=False)
+        print(json.dumps(run_scenario(run, args[0], size)))
+        return
+
+    print('size {0}, mock server options: {1}'.format(size, ' '.join(server_options) or 'none'))
+    print('{0:<16}{1:>10}{2:>10}{3:>12}{4:>10}{5:>10}{6:>16}'.format(
+        'scenario', 'requests', 'seconds', 'requests/s', 'p50 ms', 'p99 ms', 'peak RSS (MB)'))
+    results = []
+    for scenario in scenarios:
+        result = measure(scenario, size, server_options)
+        results.append(result)
+        print('{0:<16}{1:>10}{2:>10.3f}{3:>12.0f}{4:>10.2f}{5:>10.2f}{6:>16.1f}'.format(
+            scenario, result['requests'], result['seconds'], result['requests_per_second'], result['p50_ms'],
+            result['p99_ms'], result['peak_rss_mb']))
+
+    if output_filename is not None:
+        with open(output_filename, 'w') as output_file:
+            json.dump(dict((result['scenario'], result) for result in results), output_file, indent=2)
+
+    if baseline_filename is not None:
+        with open(baseline_filename) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
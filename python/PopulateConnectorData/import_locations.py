@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# coding:utf-8
+
+import collections
+import concurrent.futures
+import csv
+import getopt
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from python import CommonLogging
+from python import Journal
+from python import TokenBucketRateLimiter
+from python import run_bulk
+
+from populate import ConnectorPropagator
+
+logger = CommonLogging.get_logger("main")
+
+# The propagator of a worker process, created by init_worker
+propagator = None
+
+
+class AppConfig(object):
+    def __init__(self):
+        self.token = None
+        self.base_url = None
+        self.logFile = './import_locations.log'
+        self.locations_file = None
+        self.journal_file = None
+        self.cache_file = None
+        self.processes = os.cpu_count() or 1
+        self.threads = 4
+        self.shard_size = 100
+        self.rate = None
+        self.update_exchange_configuration = False
+
+        self.load_command_line_options()
+
+    def load_command_line_options(self):
+        try:
+            opts, args = getopt.getopt(sys.argv[1:], '', ['token=', 'host=', 'log=', 'locations=', 'journal=',
+                                                          'cache=', 'processes=', 'threads=', 'shard-size=', 'rate=',
+                                                          'exchange-configuration'])
+        except getopt.GetoptError as err:
+            print(str(err))
+            sys.exit(2)
+
+        for opt, arg in opts:
+            if opt == '--token':
+                self.token = arg
+            elif opt == '--host':
+                self.base_url = 'https://{0}/api/'.format(arg)
+            elif opt == '--log':
+                self.logFile = arg
+            elif opt == '--locations':
+                self.locations_file = arg
+            elif opt == '--journal':
+                self.journal_file = arg
+            elif opt == '--cache':
+                self.cache_file = arg
+            elif opt == '--processes':
+                self.processes = int(arg)
+            elif opt == '--threads':
+                self.threads = int(arg)
+            elif opt == '--shard-size':
+                self.shard_size = int(arg)
+            elif opt == '--rate':
+                self.rate = float(arg)
+            elif opt == '--exchange-configuration':
+                self.update_exchange_configuration = True
+
+        if self.locations_file is None:
+            print('--locations=<file> is required')
+            sys.exit(2)
+        if self.journal_file is None:
+            self.journal_file = self.locations_file + '.journal'
+
+
+# Rows of a location manifest: JSON lines (.jsonl / .json) or CSV with a header. Every row has a customId and
+# optionally external_location, latitude, longitude and one of vertical_profile_csv, observations_csv (file paths)
+# or csv_data_pattern, as in ConnectorPropagator.get_location_data_tuple. Empty CSV cells are left out.
+def read_locations(path):
+    with open(path, mode='r', newline='', encoding='utf-8') as locations_file:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            rows = (json.loads(line) for line in locations_file if line.strip())
+        else:
+            rows = (dict((column, value) for column, value in row.items() if value)
+                    for row in csv.DictReader(locations_file))
+        for line_number, row in enumerate(rows, 1):
+            if not row.get('customId', None):
+                raise RuntimeError('{0}: location {1} has no customId'.format(path, line_number))
+            row.setdefault('external_location', '')
+            yield row
+
+
+def get_shards(rows, shard_size):
+    rows = iter(rows)
+    for index in itertools.count():
+        shard = list(itertools.islice(rows, shard_size))
+        if not shard:
+            return
+        yield index, shard
+
+
+# Each worker process logs to its own file and owns a propagator, so a pooled SampleClient and, with rate, a
+# rate limit of its own
+def init_worker(token, base_url, cache_file, threads, rate, log_file):
+    global propagator
+    CommonLogging.configure('{0}.{1}'.format(log_file, os.getpid()), log_console=False)
+    propagator = ConnectorPropagator(token, base_url, cache_file, workers=threads)
+    if rate is not None:
+        propagator.sample_client.rest_client.set_rate_limiter(TokenBucketRateLimiter(rate))
+
+
+def populate_shard(shard_index, rows):
+    started = time.monotonic()
+    results = run_bulk(lambda row: propagator.populate_location(row['customId'], row), rows,
+                       workers=propagator.workers)
+    return {
+        'shard': shard_index,
+        'pid': os.getpid(),
+        'seconds': time.monotonic() - started,
+        'locations': [{
+            'customId': bulk_result.item['customId'],
+            'external_location': bulk_result.item['external_location'],
+            'id': bulk_result.result['id'] if bulk_result.ok else None,
+            'error': str(bulk_result.error) if not bulk_result.ok else None
+        } for bulk_result in results]
+    }
+
+
+# Shards the locations not yet done in the journal over app_config.processes worker processes, at most two shards
+# per process in flight, and journals every location of a shard once the shard is back. A rerun after a crash
+# only redoes the shards that were in flight and the locations that failed.
+def import_locations(app_config, journal):
+    skipped = 0
+
+    def get_pending_rows():
+        nonlocal skipped
+        for row in read_locations(app_config.locations_file):
+            if journal.is_done(row['customId']):
+                skipped += 1
+            else:
+                yield row
+
+    totals = {'locations': 0, 'failed': 0}
+    per_process = collections.defaultdict(lambda: {'shards': 0, 'locations': 0, 'seconds': 0.0})
+    started = time.monotonic()
+    in_flight = set()
+
+    def drain(return_when):
+        done, _ = concurrent.futures.wait(in_flight, return_when=return_when)
+        for future in done:
+            in_flight.remove(future)
+            shard = future.result()
+            for location in shard['locations']:
+                journal.record(location['customId'], location['error'] is None, id=location['id'],
+                               external_location=location['external_location'], error=location['error'])
+            journal.sync()
+
+            failed = sum(1 for location in shard['locations'] if location['error'] is not None)
+            totals['locations'] += len(shard['locations'])
+            totals['failed'] += failed
+            process = per_process[shard['pid']]
+            process['shards'] += 1
+            process['locations'] += len(shard['locations'])
+            process['seconds'] += shard['seconds']
+            elapsed = time.monotonic() - started
+            logger.info('shard %d (pid %d): %d locations, %d failed in %.2fs (%.1f/s); total %d at %.1f/s',
+                        shard['shard'], shard['pid'], len(shard['locations']), failed, shard['seconds'],
+                        len(shard['locations']) / shard['seconds'] if shard['seconds'] else 0.0,
+                        totals['locations'], totals['locations'] / elapsed if elapsed else 0.0)
+
+    # spawn: a forked worker would inherit the connection pools and logging threads of this process
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=app_config.processes, mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker, initargs=(app_config.token, app_config.base_url, app_config.cache_file,
+                                               app_config.threads, app_config.rate, app_config.logFile)) as executor:
+        for shard_index, rows in get_shards(get_pending_rows(), app_config.shard_size):
+            in_flight.add(executor.submit(populate_shard, shard_index, rows))
+            if len(in_flight) >= app_config.processes * 2:
+                drain(concurrent.futures.FIRST_COMPLETED)
+        while in_flight:
+            drain(concurrent.futures.ALL_COMPLETED)
+
+    elapsed = time.monotonic() - started
+    for pid, process in sorted(per_process.items()):
+        logger.info('pid %d: %d shards, %d locations in %.2fs busy (%.1f/s)', pid, process['shards'],
+                    process['locations'], process['seconds'],
+                    process['locations'] / process['seconds'] if process['seconds'] else 0.0)
+    logger.info('%d locations, %d failed, %d already done in %.2fs (%.1f/s)', totals['locations'], totals['failed'],
+                skipped, elapsed, totals['locations'] / elapsed if elapsed else 0.0)
+    return dict(totals, skipped=skipped, seconds=elapsed)
+
+
+if __name__ == '__main__':
+    app_config = AppConfig()
+    CommonLogging.configure(app_config.logFile, async_logging=True)
+
+    with Journal(app_config.journal_file) as journal:
+        summary = import_locations(app_config, journal)
+
+        # Maps every location done so far, including those of earlier runs, in one exchange configuration update
+        if app_config.update_exchange_configuration:
+            connector_propagator = ConnectorPropagator(app_config.token, app_config.base_url, app_config.cache_file)
+            connector_propagator.populate_exchange_configuration(
+                external_location_dict=dict((entry['id'], entry['external_location']) for entry in journal.get_done()),
+                observation_map_tuple=connector_propagator.get_observation_map_tuple())
+
+    if summary['failed']:
+        logger.error('%d locations failed, rerun to retry them', summary['failed'])
+        sys.exit(1)
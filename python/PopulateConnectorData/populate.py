@@ -1,13 +1,26 @@
 #!/usr/bin/python
 # coding:utf-8
 
+import concurrent.futures
 import getopt
 import sys
+import threading
 
+from python import ClientRegistry
 from python import CommonLogging
-from python import SampleClient
+from python import DiskCache
+from python import IdentityCache
+from python import MetricsCollector
+from python import ObservationManifest
+from python import TaskGraph
+from python import TokenBucketRateLimiter
+from python import fingerprint_csv
+from python import has_changes
+from python import run_bulk
 
 logger = CommonLogging.get_logger("main")
+# Propagators are created in parallel; configuring the client they share is serialized
+client_configuration_lock = threading.Lock()
 
 
 class AppConfig(object):
@@ -16,12 +29,19 @@ class AppConfig(object):
         self.base_url = None
         self.base_url_second = None
         self.logFile = './client.log'
+        self.cache_file = None
+        self.metrics_file = None
+        self.workers = 8
+        self.rate = None
+        self.sequential = False
+        self.manifest_file = None
 
         self.load_command_line_options()
 
     def load_command_line_options(self):
         try:
-            opts, args = getopt.getopt(sys.argv[1:], '', ['token=', 'host=', 'host2=', 'log'])
+            opts, args = getopt.getopt(sys.argv[1:], '', ['token=', 'host=', 'host2=', 'log', 'cache=', 'metrics=',
+                                                          'workers=', 'rate=', 'sequential', 'manifest='])
         except getopt.GetoptError as err:
             print(str(err))
             sys.exit(2)
@@ -36,32 +56,86 @@ class AppConfig(object):
                     self.base_url_second = 'https://{0}/api/'.format(arg)
                 elif opt == '--log':
                     self.logFile = arg
+                elif opt == '--cache':
+                    self.cache_file = arg
+                elif opt == '--metrics':
+                    self.metrics_file = arg
+                elif opt == '--workers':
+                    self.workers = int(arg)
+                elif opt == '--rate':
+                    self.rate = float(arg)
+                elif opt == '--sequential':
+                    self.sequential = True
+                elif opt == '--manifest':
+                    self.manifest_file = arg
                 else:
                     pass
 
 
 class ConnectorPropagator(object):
-    def __init__(self, token, base_url):
+    # workers: concurrent requests of the propagator, shared by the locations populated concurrently and the bulk
+    # deletes of each location
+    def __init__(self, token, base_url, cache_file=None, metrics_collector=None, workers=8):
         self.logger = CommonLogging.get_logger("ConnectorPropagator")
-        self.sample_client = SampleClient(token, base_url)
-        self.sample_client.check_availability()
-
+        self.workers = workers
+        self.location_workers = workers
+        # The client is shared by every propagator of the tenant; the first one configures its caches and metrics
+        # collector and later ones keep them, so a running propagator's caches are never replaced
+        self.sample_client = ClientRegistry.get_default().get_sample_client(
+            token, base_url, pool_maxsize=max(10, workers * 2), check_availability=True)
+        with client_configuration_lock:
+            if self.sample_client.rest_client.metrics_collector is None and metrics_collector is not None:
+                self.sample_client.rest_client.set_metrics_collector(metrics_collector)
+            if self.sample_client.identity_cache is None:
+                self.sample_client.set_identity_cache(IdentityCache())
+            if self.sample_client.disk_cache is None and cache_file is not None:
+                self.sample_client.set_disk_cache(DiskCache(cache_file))
+        self.manifest = None
+
+    # With a manifest of what was last pushed per location, observations are synced incrementally: only new and
+    # changed CSV rows are uploaded and only the observations of changed or removed rows are deleted
+    def set_observation_manifest(self, manifest):
+        self.manifest = manifest
+
+    # Locations are independent, so they are populated on self.workers threads; the stages of one location still
+    # run in order. Every location is attempted and the failures are reported together once all have finished.
+    # The bulk deletes of a location get what is left of self.workers, so the requests in flight stay within it.
     def populate_locations(self, location_data_tuple):
-        sampling_locations = []
-
-        for sampling_location_custom_id, location_data in location_data_tuple.items():
-            sampling_location_overrides = {'customId': sampling_location_custom_id, 'latitude': '49.2061028', 'longitude': '-123.1504412'}
-            sampling_location = self.sample_client.get_or_create_sampling_location(sampling_location_overrides)
-            sampling_locations.append(sampling_location)
-
-            if 'csv_data_pattern' in location_data:
-                self.populate_csv_observations(sampling_location, location_data['csv_data_pattern'])
-            elif 'vertical_profile_csv' in location_data:
-                self.populate_vertical_profile_csv(sampling_location, location_data['vertical_profile_csv'])
+        def log_progress(completed, total, bulk_result):
+            self.logger.info('populate_locations %d/%d', completed, total)
+
+        locations = list(location_data_tuple.items())
+        concurrent_locations = max(1, min(self.workers, len(locations)))
+        self.location_workers = max(1, self.workers // concurrent_locations)
+        results = run_bulk(lambda location: self.populate_location(location[0], location[1]),
+                           locations, workers=concurrent_locations, progress=log_progress)
+
+        failures = [(bulk_result.item[0], bulk_result.error) for bulk_result in results if not bulk_result.ok]
+        if failures:
+            raise RuntimeError('populate_locations failed for {0} of {1} locations: {2}'.format(
+                len(failures), len(results), '; '.join('{0}: {1}'.format(sampling_location_custom_id, error)
+                                                       for sampling_location_custom_id, error in failures)))
+        return [bulk_result.result for bulk_result in results]
+
+    # location_data may also give the latitude and longitude, and the observations as an observations_csv file
+    def populate_location(self, sampling_location_custom_id, location_data):
+        sampling_location_overrides = {
+            'customId': sampling_location_custom_id,
+            'latitude': location_data.get('latitude', '49.2061028'),
+            'longitude': location_data.get('longitude', '-123.1504412')
+        }
+        sampling_location = self.sample_client.get_or_create_sampling_location(sampling_location_overrides)
 
-            self.logger.info('populate_locations %s done', sampling_location_custom_id)
+        if 'csv_data_pattern' in location_data:
+            self.populate_csv_observations(sampling_location, location_data['csv_data_pattern'])
+        elif 'observations_csv' in location_data:
+            with open(location_data['observations_csv'], mode='r', newline='', encoding='utf-8') as csv_file:
+                self.populate_observations(sampling_location, csv_file.read())
+        elif 'vertical_profile_csv' in location_data:
+            self.populate_vertical_profile_csv(sampling_location, location_data['vertical_profile_csv'])
 
-        return sampling_locations
+        self.logger.info('populate_locations %s done', sampling_location_custom_id)
+        return sampling_location
 
     def reset_exchange_configuration_setting_to_empty(self, exchange_configuration):
         exchange_configuration['settings'][:] = []
@@ -69,9 +143,24 @@ class ConnectorPropagator(object):
         exchange_configuration['observationMappings'][:] = []
         return self.sample_client.put_domain_object('exchangeconfigurations', exchange_configuration)
 
-    def populate_exchange_configuration(self, external_location_dict, observation_map_tuple):
-        exchange_configurations = self.sample_client.get_search_result('exchangeconfigurations', {'type': 'AQUARIUS_TIMESERIES'})
-        exchange_configuration = self.reset_exchange_configuration_setting_to_empty(exchange_configurations['domainObjects'][0])
+    def get_exchange_configuration(self):
+        exchange_configurations = self.sample_client.get_search_result('exchangeconfigurations', {'type': 'AQUARIUS_TIMESERIES'},
+                                                                       use_disk_cache=False)
+        return exchange_configurations['domainObjects'][0]
+
+    def get_observed_properties(self, observation_map_tuple):
+        return self.sample_client.get_domain_objects_by_custom_ids(
+            'observedproperties', [observation_map[0] for observation_map in observation_map_tuple],
+            raise_error_when_custom_id_is_unused=True)
+
+    # current_exchange_configuration and observed_properties are looked up when not given
+    def populate_exchange_configuration(self, external_location_dict, observation_map_tuple,
+                                        current_exchange_configuration=None, observed_properties=None):
+        if current_exchange_configuration is None:
+            current_exchange_configuration = self.get_exchange_configuration()
+        if observed_properties is None:
+            observed_properties = self.get_observed_properties(observation_map_tuple)
+        exchange_configuration = {'settings': [], 'samplingLocationMappings': [], 'observationMappings': []}
 
         setting_key_values = {
             'DEFAULT_TIME_ZONE_OFFSET_HOURS': '-7',
@@ -97,20 +186,34 @@ class ConnectorPropagator(object):
             })
 
         for observed_property_custom_id, aqts_parameter_type, aqts_parameter_unit in observation_map_tuple:
-            observed_property = self.sample_client.get_domain_object_by_custom_id(
-                'observedproperties', observed_property_custom_id, raise_error_when_custom_id_is_unused=True)
+            observed_property = observed_properties[observed_property_custom_id]
             exchange_configuration['observationMappings'].append({
                 'observedProperty': {'id': observed_property['id']},
                 'externalObservedProperty': aqts_parameter_type,
                 'externalUnit': aqts_parameter_unit
             })
 
-        self.sample_client.put_domain_object('exchangeconfigurations', exchange_configuration)
-        self.logger.info('populate_exchange_configuration is done')
+        _, diff = self.sample_client.update_exchange_configuration(current_exchange_configuration,
+                                                                   exchange_configuration)
+        self.logger.info('populate_exchange_configuration is done: %s', ', '.join(
+            '{0} +{1}/-{2}'.format(section, len(changes['added']), len(changes['removed']))
+            for section, changes in diff.items()) if has_changes(diff) else 'unchanged, nothing written')
 
+    # A vertical profile row becomes several observations of one activity, so it is only re-imported as a whole,
+    # and skipped when the file is unchanged since the last sync
     def populate_vertical_profile_csv(self, sampling_location, vertical_profile_csv):
+        fingerprints = None
+        if self.manifest is not None:
+            with open(vertical_profile_csv, mode='r', newline='', encoding='utf-8') as lines:
+                _, rows = fingerprint_csv(lines, key_columns=('Date', 'Time', 'Depth'), header_rows=2)
+            fingerprints = dict((key, fingerprint) for key, (fingerprint, _) in rows.items())
+            if self.manifest.get(self.sample_client.base_url, sampling_location['id']) == fingerprints:
+                self.logger.info('vertical profile of %s is unchanged', sampling_location['customId'])
+                return
+
         self.sample_client.delete_observations({'samplingLocationIds': sampling_location['id']})
-        self.sample_client.delete_field_visits_by_sampling_location_id(sampling_location['id'])
+        self.sample_client.delete_field_visits_by_sampling_location_id(sampling_location['id'],
+                                                                       workers=self.location_workers)
 
         field_visit_overrides = {
             'samplingLocation': sampling_location,
@@ -125,22 +228,60 @@ class ConnectorPropagator(object):
         }
         activity = self.sample_client.get_or_create_activity(activity_overrides)
 
-        self.sample_client.import_file('services/import/verticalprofiledata', vertical_profile_csv, params={
-            'activityId': activity['id'],
-            'samplingLocationIds': sampling_location['id']
-        })
+        response = self.sample_client.import_file('services/import/verticalprofiledata', vertical_profile_csv,
+                                                  params={
+                                                      'activityId': activity['id'],
+                                                      'samplingLocationIds': sampling_location['id']
+                                                  })
+        self.record_import(sampling_location, response, fingerprints)
 
     def populate_csv_observations(self, sampling_location, csv_data_pattern_on_location):
-        self.sample_client.delete_observations({'samplingLocationIds': sampling_location['id']})
-        self.sample_client.delete_field_visits_by_sampling_location_id(sampling_location['id'])
+        self.populate_observations(sampling_location, csv_data_pattern_on_location.format(sampling_location['customId']))
 
-        observations_csv = csv_data_pattern_on_location.format(sampling_location['customId'])
-        self.logger.debug('observations_csv: %s', observations_csv)
-        self.sample_client.import_file('services/import/observations', 'observations_data.csv', observations_csv, params={
+    def populate_observations(self, sampling_location, observations_csv):
+        self.logger.debug('observations_csv: %s', CommonLogging.truncate(observations_csv))
+        params = {
             'fileType': 'SIMPLE_CSV',
             'timeZoneOffset': '-08',
             'linkFieldVisitsForNewObservations': True
-        })
+        }
+
+        previous_fingerprints = self.manifest.get(self.sample_client.base_url, sampling_location['id']) \
+            if self.manifest is not None else None
+        if previous_fingerprints is not None:
+            fingerprints, summary = self.sample_client.sync_csv_observations(
+                sampling_location['id'], observations_csv, previous_fingerprints, params=params,
+                workers=self.location_workers)
+            self.manifest.put(self.sample_client.base_url, sampling_location['id'], fingerprints)
+            self.logger.info('observations of %s synced: %s', sampling_location['customId'], summary)
+            if summary['import_errors']:
+                raise RuntimeError('observations import of {0} failed: {1}'.format(
+                    sampling_location['customId'], summary['import_errors']))
+            return
+
+        self.sample_client.delete_observations({'samplingLocationIds': sampling_location['id']})
+        self.sample_client.delete_field_visits_by_sampling_location_id(sampling_location['id'],
+                                                                       workers=self.location_workers)
+        response = self.sample_client.import_file('services/import/observations', 'observations_data.csv',
+                                                  observations_csv, params=params)
+        fingerprints = None
+        if self.manifest is not None:
+            _, rows = fingerprint_csv(observations_csv.splitlines(True),
+                                      default_offset_hours=params['timeZoneOffset'])
+            fingerprints = dict((key, fingerprint) for key, (fingerprint, _) in rows.items())
+        self.record_import(sampling_location, response, fingerprints)
+
+    # The fingerprints of an import are only kept when the import report has no errors; otherwise the manifest entry
+    # is dropped so the next run imports the whole file again
+    def record_import(self, sampling_location, response, fingerprints):
+        errors = self.sample_client.get_import_errors(response)
+        if self.manifest is not None:
+            if errors:
+                self.manifest.invalidate(self.sample_client.base_url, sampling_location['id'])
+            elif fingerprints is not None:
+                self.manifest.put(self.sample_client.base_url, sampling_location['id'], fingerprints)
+        if errors:
+            raise RuntimeError('import of {0} failed: {1}'.format(sampling_location['customId'], errors))
 
     def get_location_data_tuple(self):
         return {
@@ -201,18 +342,34 @@ class ConnectorPropagator(object):
                 ('Turbidity', 'WTNTU', '_NTU'),
             }
 
+    # The exchange configuration and observed property lookups do not depend on the locations, so they run while
+    # the locations are populated; only the exchange configuration update waits for all three
     def populate(self):
         location_data_tuple = self.get_location_data_tuple()
-        sampling_locations = self.populate_locations(location_data_tuple)
-        self.populate_exchange_configuration(
-            external_location_dict=self.get_external_location_dict(sampling_locations, location_data_tuple),
-            observation_map_tuple=self.get_observation_map_tuple()
-        )
+        observation_map_tuple = self.get_observation_map_tuple()
+
+        task_graph = TaskGraph(workers=3)
+        task_graph.add('locations', lambda: self.populate_locations(location_data_tuple))
+        task_graph.add('get_exchange_configuration', self.get_exchange_configuration)
+        task_graph.add('get_observed_properties', lambda: self.get_observed_properties(observation_map_tuple))
+        task_graph.add('exchange_configuration',
+                       lambda sampling_locations, current_exchange_configuration, observed_properties:
+                       self.populate_exchange_configuration(
+                           external_location_dict=self.get_external_location_dict(sampling_locations,
+                                                                                  location_data_tuple),
+                           observation_map_tuple=observation_map_tuple,
+                           current_exchange_configuration=current_exchange_configuration,
+                           observed_properties=observed_properties),
+                       depends_on=['locations', 'get_exchange_configuration', 'get_observed_properties'])
+        try:
+            task_graph.run()
+        finally:
+            self.logger.info('populate critical path: %s', task_graph.format_critical_path())
 
 
 class ConnectorPropagatorOnSecondSync(ConnectorPropagator):
-    def __init__(self, token, base_url):
-        ConnectorPropagator.__init__(self, token, base_url)
+    def __init__(self, token, base_url, cache_file=None, metrics_collector=None, workers=8):
+        ConnectorPropagator.__init__(self, token, base_url, cache_file, metrics_collector, workers)
         self.logger = CommonLogging.get_logger("ConnectorPropagatorOnSecondSync")
 
     def get_location_data_tuple(self):
@@ -249,16 +406,66 @@ class ConnectorPropagatorOnSecondSync(ConnectorPropagator):
         }
 
 
+# Populates every (propagator_class, base_url) tenant. The propagators (and so their availability checks) are
+# created in parallel; propagators of the same tenant share its client from the ClientRegistry, so its connection
+# pool and, with rate, its rate limit. Tenants then run concurrently, except that a tenant listed again runs after
+# its earlier run: both rewrite its one exchange configuration. With sequential=True every tenant waits for the
+# previous one.
+def populate_tenants(tenants, app_config, metrics_collector=None, sequential=False):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tenants)) as executor:
+        propagator_futures = [executor.submit(propagator_class, app_config.token, base_url, app_config.cache_file,
+                                              metrics_collector, app_config.workers)
+                              for propagator_class, base_url in tenants]
+        propagators = [future.result() for future in propagator_futures]
+        if app_config.rate is not None:
+            for propagator in propagators:
+                if propagator.sample_client.rest_client.rate_limiter is None:
+                    propagator.sample_client.rest_client.set_rate_limiter(TokenBucketRateLimiter(app_config.rate))
+        if app_config.manifest_file is not None:
+            manifest = ObservationManifest(app_config.manifest_file)
+            for propagator in propagators:
+                propagator.set_observation_manifest(manifest)
+
+        populate_futures = []
+        for index, (propagator_class, base_url) in enumerate(tenants):
+            if sequential:
+                depends_on = populate_futures[-1:]
+            else:
+                depends_on = [populate_futures[earlier] for earlier in range(index) if tenants[earlier][1] == base_url]
+            populate_futures.append(executor.submit(populate_after, propagators[index], depends_on))
+
+        failures = []
+        for (propagator_class, base_url), future in zip(tenants, populate_futures):
+            try:
+                future.result()
+            except Exception as error:
+                failures.append('{0} on {1}: {2}'.format(propagator_class.__name__, base_url, error))
+        if failures:
+            raise RuntimeError('populate failed for {0}'.format('; '.join(failures)))
+
+
+def populate_after(propagator, depends_on):
+    for future in depends_on:
+        future.result()
+    propagator.populate()
+
+
 if __name__ == '__main__':
     app_config = AppConfig()
-    CommonLogging.configure(app_config.logFile)
+    CommonLogging.configure(app_config.logFile, async_logging=True)
+    metrics_collector = MetricsCollector() if app_config.metrics_file is not None else None
 
     if app_config.base_url_second is None:
-        connectorPropagator = ConnectorPropagatorOnSecondSync(app_config.token, app_config.base_url)
-        connectorPropagator.populate()
+        populate_tenants([(ConnectorPropagatorOnSecondSync, app_config.base_url)], app_config, metrics_collector)
     else:
-        connectorFirstSyncPropagator = ConnectorPropagator(app_config.token, app_config.base_url)
-        connectorFirstSyncPropagator.populate()
-
-        connectorSecondSyncPropagator = ConnectorPropagatorOnSecondSync(app_config.token, app_config.base_url_second)
-        connectorSecondSyncPropagator.populate()
+        populate_tenants([(ConnectorPropagator, app_config.base_url),
+                          (ConnectorPropagatorOnSecondSync, app_config.base_url_second)],
+                         app_config, metrics_collector, sequential=app_config.sequential)
+
+    # --metrics=<file>.prom writes Prometheus text format, any other name JSON
+    if metrics_collector is not None:
+        if app_config.metrics_file.endswith('.prom'):
+            metrics_collector.write_prometheus(app_config.metrics_file)
+        else:
+            metrics_collector.write_json(app_config.metrics_file)
+        logger.info('request metrics written to %s', app_config.metrics_file)
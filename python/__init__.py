@@ -1,3 +1,19 @@
+from .common.async_rest_client import AsyncRestClient
+from .common.async_sample_client import AsyncSampleClient
+from .common.bulk import BulkResult, run_bulk
+from .common.cascade_delete import CascadeDeleter
+from .common.client_registry import ClientRegistry
 from .common.common_logging import CommonLogging
+from .common.disk_cache import DiskCache
+from .common.exchange_configuration import diff_exchange_configuration, has_changes, merge_exchange_configuration
+from .common.http_cache import HttpCache
+from .common.identity_cache import IdentityCache
+from .common.journal import Journal
+from .common.metrics import MetricsCollector
+from .common.models import Activity, DomainObject, FieldVisit, Observation, ObservedProperty, SamplingLocation
+from .common.observation_sync import ObservationManifest, diff_fingerprints, fingerprint_csv
+from .common.rate_limiter import AdaptiveRateLimiter, FileTokenBucketRateLimiter, TokenBucketRateLimiter
 from .common.rest_client import RestClient
+from .common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
 from .common.sample_client import SampleClient
+from .common.task_graph import TaskGraph
@@ -1,3 +1,19 @@
+from .async_rest_client import AsyncRestClient
+from .async_sample_client import AsyncSampleClient
+from .bulk import BulkResult, run_bulk
+from .cascade_delete import CascadeDeleter
+from .client_registry import ClientRegistry
 from .common_logging import CommonLogging
+from .disk_cache import DiskCache
+from .exchange_configuration import diff_exchange_configuration, has_changes, merge_exchange_configuration
+from .http_cache import HttpCache
+from .identity_cache import IdentityCache
+from .journal import Journal
+from .metrics import MetricsCollector
+from .models import Activity, DomainObject, FieldVisit, Observation, ObservedProperty, SamplingLocation
+from .observation_sync import ObservationManifest, diff_fingerprints, fingerprint_csv
+from .rate_limiter import AdaptiveRateLimiter, FileTokenBucketRateLimiter, TokenBucketRateLimiter
 from .rest_client import RestClient
+from .retry import CircuitBreaker, CircuitOpenError, RetryPolicy
 from .sample_client import SampleClient
+from .task_graph import TaskGraph
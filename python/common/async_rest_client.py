@@ -0,0 +1,66 @@
+import asyncio
+import concurrent.futures
+import functools
+
+from .common_logging import CommonLogging
+from .rest_client import RestClient
+
+
+# Runs RestClient calls on a bounded worker pool so coroutines can share one pooled session.
+# max_concurrency caps the requests in flight and sizes the per-host connection pool to match. Requests stay
+# blocking: each one in flight holds a worker thread, so max_concurrency is also the thread count and should stay
+# in the tens. A rest_client passed in is left open by close().
+class AsyncRestClient(object):
+    def __init__(self, rest_client=None, max_concurrency=16):
+        self.logger = CommonLogging.get_logger("AsyncRestClient")
+        self.max_concurrency = max_concurrency
+        self.owns_rest_client = rest_client is None
+        if rest_client is None:
+            rest_client = RestClient(pool_maxsize=max_concurrency)
+        self.rest_client = rest_client
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency,
+                                                              thread_name_prefix='AsyncRestClient')
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func, *args, **kwargs):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def set_verify(self, verify):
+        self.rest_client.set_verify(verify)
+
+    def set_cert(self, cert):
+        self.rest_client.set_cert(cert)
+
+    def set_default_headers(self, headers):
+        self.rest_client.set_default_headers(headers)
+
+    def get_connection_stats(self):
+        return self.rest_client.get_connection_stats()
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        if self.owns_rest_client:
+            self.rest_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def get(self, url, headers=None):
+        return await self.run(self.rest_client.get, url, headers=headers)
+
+    async def post(self, url, data=None, headers=None):
+        return await self.run(self.rest_client.post, url, data=data, headers=headers)
+
+    async def put(self, url, data=None, headers=None):
+        return await self.run(self.rest_client.put, url, data=data, headers=headers)
+
+    async def delete(self, url, headers=None):
+        return await self.run(self.rest_client.delete, url, headers=headers)
+
+    async def post_file(self, url, files):
+        return await self.run(self.rest_client.post_file, url, files)
@@ -0,0 +1,133 @@
+import asyncio
+
+from .async_rest_client import AsyncRestClient
+from .common_logging import CommonLogging
+from .sample_client import SampleClient
+
+
+# asyncio counterpart of SampleClient. Each call is a coroutine, so one instance can be shared by many tasks;
+# at most max_concurrency requests are in flight at a time over one shared connection pool, each on a worker thread
+# of the AsyncRestClient. An async_rest_client passed in is left open by close().
+class AsyncSampleClient(object):
+    def __init__(self, token, base_url, async_rest_client=None, max_concurrency=16):
+        self.logger = CommonLogging.get_logger("AsyncSampleClient")
+        self.owns_async_rest_client = async_rest_client is None
+        self.async_rest_client = async_rest_client if async_rest_client is not None \
+            else AsyncRestClient(max_concurrency=max_concurrency)
+        self.sample_client = SampleClient(token, base_url, rest_client=self.async_rest_client.rest_client)
+        self.token = token
+        self.base_url = base_url
+
+    async def close(self):
+        if self.owns_async_rest_client:
+            await self.async_rest_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def check_availability(self):
+        return await self.async_rest_client.run(self.sample_client.check_availability)
+
+    def get_url(self, list_path, params=None, domain_object_id=None, version='v1', with_token=False):
+        return self.sample_client.get_url(list_path, params=params, domain_object_id=domain_object_id,
+                                          version=version, with_token=with_token)
+
+    '''Generic domain object methods'''
+    async def get_search_result(self, list_path, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.get_search_result, list_path, params=params,
+                                                version=version)
+
+    async def iter_domain_objects(self, list_path, params=None, page_size=1000, prefetch=False, version='v1'):
+        page_params = {} if params is None else dict(params)
+        page_params['limit'] = page_size
+        pending = asyncio.ensure_future(self.get_search_result(list_path, params=dict(page_params), version=version))
+        try:
+            while pending is not None:
+                page = await pending
+                domain_objects = page.get('domainObjects', [])
+                page_params = SampleClient.get_next_page_params(page_params, page) if domain_objects else None
+                pending = None
+                del page
+                if page_params is not None and prefetch:
+                    pending = asyncio.ensure_future(
+                        self.get_search_result(list_path, params=dict(page_params), version=version))
+                for domain_object in domain_objects:
+                    yield domain_object
+                del domain_objects
+                if page_params is not None and not prefetch:
+                    pending = asyncio.ensure_future(
+                        self.get_search_result(list_path, params=dict(page_params), version=version))
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def get_domain_object_by_custom_id(self, list_path, custom_id, raise_error_when_custom_id_is_unused=False,
+                                             version='v1'):
+        return await self.async_rest_client.run(
+            self.sample_client.get_domain_object_by_custom_id, list_path, custom_id,
+            raise_error_when_custom_id_is_unused=raise_error_when_custom_id_is_unused, version=version)
+
+    async def get_domain_objects_by_custom_ids(self, list_path, custom_ids, raise_error_when_custom_id_is_unused=False,
+                                               version='v1'):
+        return await self.async_rest_client.run(
+            self.sample_client.get_domain_objects_by_custom_ids, list_path, custom_ids,
+            raise_error_when_custom_id_is_unused=raise_error_when_custom_id_is_unused, version=version)
+
+    async def get_domain_object_by_id(self, list_path, domain_object_id, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.get_domain_object_by_id, list_path,
+                                                domain_object_id, params=params, version=version)
+
+    async def post_domain_object(self, list_path, domain_object, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.post_domain_object, list_path, domain_object,
+                                                params=params, version=version)
+
+    async def put_domain_object(self, list_path, domain_object, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.put_domain_object, list_path, domain_object,
+                                                params=params, version=version)
+
+    async def delete(self, list_path, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.delete, list_path, params=params,
+                                                version=version)
+
+    async def delete_domain_object_by_id(self, list_path, domain_object_id, params=None, version='v1'):
+        return await self.async_rest_client.run(self.sample_client.delete_domain_object_by_id, list_path,
+                                                domain_object_id, params=params, version=version)
+
+    async def import_file(self, path, filename, file_content=None, params=None, domain_object=None):
+        return await self.async_rest_client.run(self.sample_client.import_file, path, filename,
+                                                file_content=file_content, params=params,
+                                                domain_object=domain_object)
+
+    '''Specific domain object methods'''
+
+    async def get_or_create_sampling_location(self, sampling_location_overrides):
+        return await self.async_rest_client.run(self.sample_client.get_or_create_sampling_location,
+                                                sampling_location_overrides)
+
+    async def get_or_create_field_visit(self, field_visit_overrides):
+        return await self.async_rest_client.run(self.sample_client.get_or_create_field_visit, field_visit_overrides)
+
+    async def get_or_create_activity(self, activity_overrides):
+        return await self.async_rest_client.run(self.sample_client.get_or_create_activity, activity_overrides)
+
+    async def delete_observations(self, params):
+        return await self.async_rest_client.run(self.sample_client.delete_observations, params)
+
+    async def delete_field_visits_by_sampling_location_id(self, sampling_location_id):
+        field_visit_ids = [field_visit['id'] async for field_visit in self.iter_domain_objects('fieldvisits', {
+            'samplingLocationIds': sampling_location_id
+        })]
+        await asyncio.gather(*[self.__delete_field_visit(field_visit_id) for field_visit_id in field_visit_ids])
+
+    async def __delete_field_visit(self, field_visit_id):
+        await self.delete_activities_by_field_visit_id(field_visit_id)
+        await self.delete_domain_object_by_id('fieldvisits', field_visit_id)
+
+    async def delete_activities_by_field_visit_id(self, field_visit_id):
+        activity_ids = [activity['id'] async for activity in self.iter_domain_objects(
+            'activities', {'fieldVisitId': field_visit_id})]
+        await asyncio.gather(*[self.delete_domain_object_by_id('activities', activity_id)
+                               for activity_id in activity_ids])
@@ -0,0 +1,58 @@
+import concurrent.futures
+
+from .common_logging import CommonLogging
+
+logger = CommonLogging.get_logger("Bulk")
+
+
+class BulkResult(object):
+    def __init__(self, index, item):
+        self.index = index
+        self.item = item
+        self.result = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'BulkResult(index={0}, ok={1})'.format(self.index, self.ok)
+
+
+# Calls func(item) for every item on a pool of workers with at most window calls submitted at a time, so a
+# large generator of items is never drained up front. A failing item records its exception in its BulkResult
+# instead of aborting the batch. progress(completed, total, bulk_result) is called from the calling thread;
+# total is None when items has no len(). Results are returned in input order.
+def run_bulk(func, items, workers=8, window=None, progress=None):
+    window = window if window is not None else workers * 2
+    total = len(items) if hasattr(items, '__len__') else None
+    results = []
+    in_flight = {}
+    completed = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='Bulk') as executor:
+        def drain(return_when):
+            nonlocal completed
+            done, _ = concurrent.futures.wait(in_flight, return_when=return_when)
+            for future in done:
+                bulk_result = in_flight.pop(future)
+                try:
+                    bulk_result.result = future.result()
+                except Exception as error:
+                    bulk_result.error = error
+                    logger.error('bulk item %d failed: %s', bulk_result.index, error)
+                completed += 1
+                if progress is not None:
+                    progress(completed, total, bulk_result)
+
+        for index, item in enumerate(items):
+            bulk_result = BulkResult(index, item)
+            results.append(bulk_result)
+            in_flight[executor.submit(func, item)] = bulk_result
+            if len(in_flight) >= window:
+                drain(concurrent.futures.FIRST_COMPLETED)
+        while in_flight:
+            drain(concurrent.futures.ALL_COMPLETED)
+
+    return results
@@ -0,0 +1,80 @@
+import time
+
+from .bulk import run_bulk
+from .common_logging import CommonLogging
+
+
+# Deletes everything below a sampling location (location -> field visits -> activities). The tree is read first,
+# then each level is deleted leaves first with up to `workers` concurrent requests; a field visit is only deleted
+# once all of its activities are gone, and the location only once all of its field visits are gone.
+class CascadeDeleter(object):
+    LEVELS = ('activities', 'fieldvisits', 'samplinglocations')
+
+    def __init__(self, sample_client, workers=8):
+        self.logger = CommonLogging.get_logger("CascadeDeleter")
+        self.sample_client = sample_client
+        self.workers = workers
+
+    def delete_sampling_location(self, sampling_location_id, delete_sampling_location=True):
+        summary = {'discovery': {'seconds': 0.0}, 'errors': []}
+        for level in CascadeDeleter.LEVELS:
+            summary[level] = {'found': 0, 'deleted': 0, 'failed': 0, 'skipped': 0, 'seconds': 0.0}
+
+        started = time.monotonic()
+        activity_ids_by_field_visit_id = self.__discover(sampling_location_id)
+        summary['discovery']['seconds'] = time.monotonic() - started
+
+        activity_ids = [(field_visit_id, activity_id)
+                        for field_visit_id, activity_ids in activity_ids_by_field_visit_id.items()
+                        for activity_id in activity_ids]
+        failed_field_visit_ids = set(
+            field_visit_id for field_visit_id, _ in self.__delete_level(
+                summary, 'activities', activity_ids, lambda pair: pair[1]))
+
+        field_visit_ids = [field_visit_id for field_visit_id in activity_ids_by_field_visit_id
+                           if field_visit_id not in failed_field_visit_ids]
+        summary['fieldvisits']['skipped'] = len(failed_field_visit_ids)
+        failed_field_visit_ids.update(self.__delete_level(
+            summary, 'fieldvisits', field_visit_ids, lambda field_visit_id: field_visit_id))
+        summary['fieldvisits']['found'] = len(activity_ids_by_field_visit_id)
+
+        if delete_sampling_location:
+            if failed_field_visit_ids:
+                summary['samplinglocations']['found'] = summary['samplinglocations']['skipped'] = 1
+            else:
+                self.__delete_level(summary, 'samplinglocations', [sampling_location_id],
+                                    lambda location_id: location_id)
+
+        self.logger.debug('cascade delete of sampling location %s: %s', sampling_location_id, summary)
+        return summary
+
+    def __discover(self, sampling_location_id):
+        field_visit_ids = [field_visit['id'] for field_visit in self.sample_client.iter_domain_objects(
+            'fieldvisits', {'samplingLocationIds': sampling_location_id})]
+        results = run_bulk(
+            lambda field_visit_id: [activity['id'] for activity in self.sample_client.iter_domain_objects(
+                'activities', {'fieldVisitId': field_visit_id})],
+            field_visit_ids, workers=self.workers)
+        for bulk_result in results:
+            if not bulk_result.ok:
+                raise bulk_result.error
+        return dict((bulk_result.item, bulk_result.result) for bulk_result in results)
+
+    # Returns the items that could not be deleted
+    def __delete_level(self, summary, list_path, items, get_id):
+        level = summary[list_path]
+        started = time.monotonic()
+        results = run_bulk(lambda item: self.sample_client.delete_domain_object_by_id(list_path, get_id(item)),
+                           items, workers=self.workers)
+        level['seconds'] = time.monotonic() - started
+        level['found'] = len(items)
+        failed_items = []
+        for bulk_result in results:
+            if bulk_result.ok:
+                level['deleted'] += 1
+            else:
+                level['failed'] += 1
+                failed_items.append(bulk_result.item)
+                summary['errors'].append('{0} {1}: {2}'.format(list_path, get_id(bulk_result.item),
+                                                               bulk_result.error))
+        return failed_items
@@ -0,0 +1,66 @@
+import atexit
+import threading
+
+from .common_logging import CommonLogging
+from .rest_client import RestClient
+from .sample_client import SampleClient
+
+
+# One shared SampleClient per tenant, keyed by (base_url, token, TLS settings), so every part of a process talks to
+# a tenant over one connection pool. SampleClient is safe to share between threads; its caches, rate limiter and
+# hooks are then shared too. The first get_sample_client of a tenant decides its pool_maxsize. The tenant status is
+# cached for status_ttl seconds, so asking for an available client again does not re-check it.
+# ClientRegistry.get_default() is the process-wide registry, closed when the process exits.
+class ClientRegistry(object):
+    __default__ = None
+    __default_lock__ = threading.Lock()
+
+    def __init__(self, status_ttl=300):
+        self.logger = CommonLogging.get_logger("ClientRegistry")
+        self.status_ttl = status_ttl
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def get_default():
+        with ClientRegistry.__default_lock__:
+            if ClientRegistry.__default__ is None:
+                ClientRegistry.__default__ = ClientRegistry()
+                atexit.register(ClientRegistry.__default__.close)
+            return ClientRegistry.__default__
+
+    @staticmethod
+    def get_key(token, base_url):
+        verify, cert = SampleClient.get_tls_settings(base_url)
+        return base_url, token, verify, cert
+
+    # With check_availability=True the tenant status is checked unless it was less than status_ttl seconds ago
+    def get_sample_client(self, token, base_url, pool_maxsize=10, check_availability=False):
+        key = ClientRegistry.get_key(token, base_url)
+        with self.lock:
+            sample_client, client_pool_maxsize = self.clients.get(key, (None, None))
+            if sample_client is None:
+                sample_client = SampleClient(token, base_url, RestClient(pool_maxsize=pool_maxsize))
+                self.clients[key] = (sample_client, pool_maxsize)
+                self.created += 1
+            else:
+                self.reused += 1
+                if pool_maxsize > client_pool_maxsize:
+                    self.logger.warning('client of %s keeps its pool of %d connections, %d were asked for',
+                                        base_url, client_pool_maxsize, pool_maxsize)
+        if check_availability:
+            sample_client.check_availability(max_age=self.status_ttl)
+        return sample_client
+
+    def get_stats(self):
+        with self.lock:
+            return {'clients': len(self.clients), 'created': self.created, 'reused': self.reused}
+
+    def close(self):
+        with self.lock:
+            sample_clients = [sample_client for sample_client, _ in self.clients.values()]
+            self.clients.clear()
+        for sample_client in sample_clients:
+            sample_client.close()
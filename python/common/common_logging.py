@@ -1,22 +1,146 @@
-import datetime as dt
+import atexit
+import json.encoder
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
+import random
 import threading
+import time
 
 __prefix__ = 'AQSRestClient'
-__pid__ = os.getpid()
 __loggers__ = []
+__listeners__ = []
+__encode_string__ = json.encoder.encode_basestring_ascii
 
 
+# Writes '<time>,<msecs> [<pid>-<thread>] <level> <logger> : <message>' lines, or one JSON object per line with
+# json_lines=True. The time up to the second is formatted once per second and reused for the records within it.
 class CommonLoggingFormatter(logging.Formatter):
-    converter = dt.datetime.fromtimestamp
+    def __init__(self, json_lines=False, datefmt=None):
+        logging.Formatter.__init__(self, datefmt=datefmt)
+        self.json_lines = json_lines
+        self.cached_second = (None, None, None)
 
-    def format_time(self, record, date_format=None):
-        ct = self.converter(record.created)
-        s = ct.strftime(date_format) if date_format else ct.strftime("%Y-%m-%d %H:%M:%S")
-        s += ",%03d [%d]" % (record.msecs, __pid__, threading.get_ident())
-        return s
+    def formatTime(self, record, datefmt=None):
+        datefmt = datefmt or self.datefmt or self.default_time_format
+        second = int(record.created)
+        cached_second = self.cached_second
+        if cached_second[0] != second or cached_second[1] != datefmt:
+            cached_second = (second, datefmt, time.strftime(datefmt, self.converter(second)))
+            self.cached_second = cached_second
+        return '%s,%03d' % (cached_second[2], record.msecs)
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        process = record.process if record.process is not None else os.getpid()
+
+        if self.json_lines:
+            line = '{"time": "%s", "pid": %d, "thread": %d, "level": "%s", "logger": %s, "message": %s' % (
+                self.formatTime(record), process, record.thread, record.levelname, __encode_string__(record.name),
+                __encode_string__(message))
+            if record.exc_text:
+                line += ', "exception": ' + __encode_string__(record.exc_text)
+            if record.stack_info:
+                line += ', "stack": ' + __encode_string__(record.stack_info)
+            return line + '}'
+
+        line = '%s [%d-%d] %s %s : %s' % (self.formatTime(record), process, record.thread, record.levelname,
+                                         record.name, message)
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        if record.stack_info:
+            line += '\n' + self.formatStack(record.stack_info)
+        return line
+
+
+# Lets through a debug_sample_rate fraction of DEBUG records and at most debug_rate_limit of them per second;
+# other levels always pass. The decision is kept on the record so handlers sharing the filter agree.
+class DebugSamplingFilter(logging.Filter):
+    def __init__(self, debug_sample_rate=None, debug_rate_limit=None):
+        logging.Filter.__init__(self)
+        self.debug_sample_rate = debug_sample_rate
+        self.debug_rate_limit = debug_rate_limit
+        self.lock = threading.Lock()
+        self.window = None
+        self.window_count = 0
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG:
+            return True
+        sampled = getattr(record, 'aqs_sampled', None)
+        if sampled is None:
+            sampled = self.__sample()
+            record.aqs_sampled = sampled
+        return sampled
+
+    def __sample(self):
+        if self.debug_sample_rate is not None and random.random() >= self.debug_sample_rate:
+            with self.lock:
+                self.dropped += 1
+            return False
+        if self.debug_rate_limit is None:
+            return True
+        window = int(time.monotonic())
+        with self.lock:
+            if window != self.window:
+                self.window = window
+                self.window_count = 0
+            self.window_count += 1
+            if self.window_count > self.debug_rate_limit:
+                self.dropped += 1
+                return False
+            return True
+
+
+# Cuts the formatted message to max_message_length characters so payloads dumped into a log stay bounded
+class TruncatingFilter(logging.Filter):
+    def __init__(self, max_message_length):
+        logging.Filter.__init__(self)
+        self.max_message_length = max_message_length
+
+    # Cuts the string arguments of a record, so merging them into the message does not copy whole payloads
+    def truncate_args(self, args):
+        if isinstance(args, dict):
+            return dict((key, self.__truncate_arg(value)) for key, value in args.items())
+        return tuple(self.__truncate_arg(arg) for arg in args)
+
+    def __truncate_arg(self, arg):
+        if isinstance(arg, str) and len(arg) > self.max_message_length:
+            return CommonLogging.truncate(arg, self.max_message_length)
+        return arg
+
+    def filter(self, record):
+        if getattr(record, 'aqs_truncated', False):
+            return True
+        record.aqs_truncated = True
+        message = record.getMessage()
+        if len(message) > self.max_message_length:
+            record.msg = '{0}... [{1} more characters]'.format(
+                message[:self.max_message_length], len(message) - self.max_message_length)
+            record.args = None
+        return True
+
+
+# Merges the arguments into the message on the logging thread, so the record no longer refers to objects the caller
+# may change once the call returned. String arguments are cut to the truncating_filter length first, so a payload
+# passed as an argument is not copied whole; the message as a whole is truncated and laid out on the listener thread.
+# Unlike the stdlib prepare, exc_info is kept for the listener's formatters.
+class _MessageQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, queue, truncating_filter=None):
+        logging.handlers.QueueHandler.__init__(self, queue)
+        self.truncating_filter = truncating_filter
+
+    def prepare(self, record):
+        if self.truncating_filter is not None and record.args:
+            record.args = self.truncating_filter.truncate_args(record.args)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
 
 
 class CommonLogging(object):
@@ -30,11 +154,18 @@ class CommonLogging(object):
         __loggers__.append(logger)
         return logger
 
+    # async_logging: handlers run on a background listener thread fed by a queue, so logging does not block on I/O
+    # log_file_max_bytes: rotate the log file at this size, keeping log_file_backup_count old files
+    # debug_sample_rate / debug_rate_limit: keep only a fraction / at most this many DEBUG records per second
+    # max_message_length: truncate longer messages (e.g. dumped payloads)
+    # log_file_json: write the log file as JSON lines for log shipping
     @staticmethod
     def configure(log_filename=None, log_file_mode='a', log_file_level=logging.INFO,
-                  log_console=True, log_console_level=logging.DEBUG):
+                  log_console=True, log_console_level=logging.DEBUG, async_logging=False,
+                  log_file_max_bytes=None, log_file_backup_count=3, debug_sample_rate=None, debug_rate_limit=None,
+                  max_message_length=None, log_file_json=False):
+        CommonLogging.stop_listeners()
 
-        verbose_format = '%(asctime)s [%(process)d-%(thread)d] %(levelname)s %(name)s : %(message)s'
         medium_format = '%(asctime)s %(levelname)s %(name)s : %(message)s'
         simple_format = '%(levelname)s %(message)s'
 
@@ -43,7 +174,7 @@ class CommonLogging(object):
             'formatters': {
                 'simple': {'format': simple_format},
                 'medium': {'format': medium_format},
-                'verbose': {'format': verbose_format}
+                'verbose': {'()': CommonLoggingFormatter, 'json_lines': log_file_json}
             },
             'handlers': {
                 'console': {
@@ -63,15 +194,72 @@ class CommonLogging(object):
                 'class': 'logging.FileHandler', 'filename': log_filename, 'mode': log_file_mode,
                 'formatter': 'verbose', 'level': log_file_level
             }
-            # logConfig['handlers']['file'] = {
-            #    'class':'logging.handlers.RotatingFileHandler', 'filename':logFilename,
-            #    'formatter':'verbose', 'level':logFileLevel, 'maxBytes' : 1024, 'backupCount' : 3,
-            # }
+            if log_file_max_bytes is not None:
+                log_config['handlers']['file'] = {
+                    'class': 'logging.handlers.RotatingFileHandler', 'filename': log_filename, 'mode': log_file_mode,
+                    'formatter': 'verbose', 'level': log_file_level, 'maxBytes': log_file_max_bytes,
+                    'backupCount': log_file_backup_count
+                }
             for key, handle in log_config['loggers'].items():
                 handle['handlers'].append('file')
 
+        if not log_console:
+            for key, handle in log_config['loggers'].items():
+                handle['handlers'].remove('console')
+
         logging.config.dictConfig(log_config)
 
+        logger = logging.getLogger(__prefix__)
+        handlers = list(logger.handlers)
+        sampling_filter = DebugSamplingFilter(debug_sample_rate, debug_rate_limit) \
+            if debug_sample_rate is not None or debug_rate_limit is not None else None
+        truncating_filter = TruncatingFilter(max_message_length) if max_message_length is not None else None
+        for handler in handlers:
+            if truncating_filter is not None:
+                handler.addFilter(truncating_filter)
+            if sampling_filter is not None and not async_logging:
+                handler.addFilter(sampling_filter)
+
+        if async_logging:
+            log_queue = queue.SimpleQueue()
+            queue_handler = _MessageQueueHandler(log_queue, truncating_filter)
+            # Records no downstream handler takes are dropped before their message is merged
+            queue_handler.setLevel(min(handler.level for handler in handlers) if handlers else logging.NOTSET)
+            if sampling_filter is not None:
+                queue_handler.addFilter(sampling_filter)
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(queue_handler)
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            __listeners__.append(listener)
+
+    # Flushes what is still queued in async mode; also called at exit
+    @staticmethod
+    def stop_listeners():
+        while __listeners__:
+            __listeners__.pop().stop()
+
+    # E.g. mask_secret('0123456789abcdef') == '************cdef'
+    @staticmethod
+    def mask_secret(secret, visible=4):
+        if secret is None:
+            return None
+        secret = str(secret)
+        if len(secret) <= visible * 2:
+            return '*' * len(secret)
+        return '*' * (len(secret) - visible) + secret[-visible:]
+
+    @staticmethod
+    def truncate(text, max_length=200):
+        if text is None or len(text) <= max_length:
+            return text
+        return '{0}... [{1} more characters]'.format(text[:max_length], len(text) - max_length)
+
     @staticmethod
     def shutdown():
+        CommonLogging.stop_listeners()
         logging.shutdown()
+
+
+atexit.register(CommonLogging.stop_listeners)
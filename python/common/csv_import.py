@@ -0,0 +1,54 @@
+# Groups physical lines into CSV records, keeping a quoted field that spans several lines in one record
+def iter_csv_records(lines):
+    record = []
+    quotes = 0
+    for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield ''.join(record)
+            record = []
+            quotes = 0
+    if record:
+        yield ''.join(record)
+
+
+# Splits CSV lines into chunks of at most rows_per_chunk records, each starting with the header_rows header
+# records. Records are kept verbatim and only one chunk is held at a time.
+def split_csv(lines, rows_per_chunk, header_rows=1):
+    header = []
+    chunk = []
+    for record in iter_csv_records(lines):
+        if len(header) < header_rows:
+            header.append(record)
+            continue
+        if not record.strip():
+            continue
+        if not record.endswith('\n'):
+            record += '\n'
+        chunk.append(record)
+        if len(chunk) >= rows_per_chunk:
+            yield header + chunk
+            chunk = []
+    if chunk:
+        yield header + chunk
+
+
+# Combines the import reports of several chunks: numbers are summed, lists concatenated, nested objects merged
+# the same way and any other value is kept from the first report that has it.
+def merge_import_reports(reports):
+    merged = {}
+    for report in reports:
+        for key, value in report.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else \
+                    merge_import_reports([value]) if isinstance(value, dict) else value
+            elif isinstance(value, bool) or value is None:
+                continue
+            elif isinstance(value, (int, float)) and isinstance(merged[key], (int, float)):
+                merged[key] += value
+            elif isinstance(value, list) and isinstance(merged[key], list):
+                merged[key].extend(value)
+            elif isinstance(value, dict) and isinstance(merged[key], dict):
+                merged[key] = merge_import_reports([merged[key], value])
+    return merged
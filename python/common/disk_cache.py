@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+
+__DEFAULT_PATH__ = os.path.join('~', '.cache', 'aqsrestclient', 'cache.sqlite')
+
+
+# Response bodies kept in a sqlite file so a new process starts warm. Entries are namespaced per tenant base_url and
+# grouped by list_path for invalidation, expire ttl seconds after they were stored and are evicted least recently
+# used first once the bodies add up to more than max_bytes. Several processes may share one file.
+class DiskCache(object):
+    def __init__(self, path=__DEFAULT_PATH__, ttl=24 * 60 * 60, max_bytes=64 * 1024 * 1024):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                                'namespace TEXT NOT NULL, list_path TEXT NOT NULL, key TEXT NOT NULL, '
+                                'value BLOB NOT NULL, size INTEGER NOT NULL, expires_at REAL, '
+                                'last_access REAL NOT NULL, PRIMARY KEY (namespace, key))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+
+    def get(self, namespace, key):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute('SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?',
+                                          (namespace, key)).fetchone()
+            if row is not None and row[1] is not None and row[1] < now:
+                self.connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute('UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?',
+                                    (now, namespace, key))
+            self.hits += 1
+            return bytes(row[0])
+
+    def put(self, namespace, list_path, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        (namespace, list_path, key, sqlite3.Binary(value), len(value), expires_at,
+                                         now))
+                self.__evict()
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    # Drops every entry, the entries of one tenant or only those of one list_path of that tenant
+    def invalidate(self, namespace=None, list_path=None):
+        with self.lock:
+            if namespace is None:
+                self.connection.execute('DELETE FROM entries')
+            elif list_path is None:
+                self.connection.execute('DELETE FROM entries WHERE namespace = ?', (namespace,))
+            else:
+                self.connection.execute('DELETE FROM entries WHERE namespace = ? AND list_path = ?',
+                                        (namespace, list_path))
+
+    def clear(self):
+        self.invalidate()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get_stats(self):
+        with self.lock:
+            size, total_bytes = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries') \
+                .fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': size,
+                'bytes': total_bytes
+            }
+
+    def __evict(self):
+        self.expirations += self.connection.execute('DELETE FROM entries WHERE expires_at < ?',
+                                                    (time.time(),)).rowcount
+        total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        rows = self.connection.execute('SELECT namespace, key, size FROM entries ORDER BY last_access').fetchall()
+        for namespace, key, size in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            self.connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+            total_bytes -= size
+            self.evictions += 1
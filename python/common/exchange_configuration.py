@@ -0,0 +1,57 @@
+import collections
+import copy
+
+__SECTIONS__ = ('settings', 'samplingLocationMappings', 'observationMappings')
+
+
+def _get_id(entry, key):
+    value = entry.get(key, None)
+    return value.get('id', None) if isinstance(value, dict) else None
+
+
+# What identifies an entry of each section; server-side fields such as the entry id are ignored
+def _get_entry_key(section, entry):
+    if section == 'settings':
+        return entry.get('key', None), entry.get('value', None)
+    if section == 'samplingLocationMappings':
+        return _get_id(entry, 'samplingLocation'), entry.get('externalLocation', None)
+    return _get_id(entry, 'observedProperty'), entry.get('externalObservedProperty', None), \
+        entry.get('externalUnit', None)
+
+
+# Pairs every desired entry with an equal server entry (or None) and returns the server entries left over
+def _match_entries(section, current, desired):
+    current_by_key = collections.defaultdict(collections.deque)
+    for entry in current.get(section, None) or []:
+        current_by_key[_get_entry_key(section, entry)].append(entry)
+    pairs = []
+    for entry in desired.get(section, None) or []:
+        matches = current_by_key.get(_get_entry_key(section, entry), None)
+        pairs.append((entry, matches.popleft() if matches else None))
+    unmatched = [entry for matches in current_by_key.values() for entry in matches]
+    return pairs, unmatched
+
+
+# Compares the settings, samplingLocationMappings and observationMappings of the exchange configuration on the
+# server with the desired ones (order does not matter). Returns {section: {'added': [...], 'removed': [...]}} with
+# the desired entries missing on the server and the server entries not desired anymore.
+def diff_exchange_configuration(current, desired):
+    diff = {}
+    for section in __SECTIONS__:
+        pairs, unmatched = _match_entries(section, current, desired)
+        diff[section] = {'added': [entry for entry, match in pairs if match is None], 'removed': unmatched}
+    return diff
+
+
+def has_changes(diff):
+    return any(changes['added'] or changes['removed'] for changes in diff.values())
+
+
+# The document to PUT: the server document with each section in the desired order, keeping the server's own entry
+# for every desired entry that already exists
+def merge_exchange_configuration(current, desired):
+    merged = copy.deepcopy(current)
+    for section in __SECTIONS__:
+        pairs, _ = _match_entries(section, current, desired)
+        merged[section] = [copy.deepcopy(match if match is not None else entry) for entry, match in pairs]
+    return merged
@@ -0,0 +1,97 @@
+import collections
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Representation headers describe the body as it was sent, not the decoded content kept here
+__DROPPED_HEADERS__ = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+# Validators (ETag / Last-Modified) and decoded bodies of GET responses per URL. RestClient sends them back as
+# If-None-Match / If-Modified-Since and answers a 304 with the stored body. At most max_entries URLs are kept,
+# least recently used first out.
+class HttpCache(object):
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bytes_saved = 0
+
+    def get_conditional_headers(self, url):
+        with self.lock:
+            entry = self.entries.get(url, None)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['etag'] is not None:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified'] is not None:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        etag = response.headers.get('ETag', None)
+        last_modified = response.headers.get('Last-Modified', None)
+        if etag is None and last_modified is None:
+            with self.lock:
+                self.misses += 1
+                self.entries.pop(url, None)
+            return
+        entry = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content': response.content,
+            'encoding': response.encoding,
+            'headers': dict((key, value) for key, value in response.headers.items()
+                            if key.lower() not in __DROPPED_HEADERS__)
+        }
+        with self.lock:
+            self.misses += 1
+            self.stores += 1
+            self.entries[url] = entry
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Turns a 304 Not Modified into the stored 200 response
+    def get_cached_response(self, url, not_modified_response):
+        with self.lock:
+            entry = self.entries.get(url, None)
+            if entry is None:
+                return None
+            self.entries.move_to_end(url)
+            self.hits += 1
+            self.bytes_saved += len(entry['content'])
+
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = entry['content']
+        response.encoding = entry['encoding']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.url = url
+        response.request = not_modified_response.request
+        response.elapsed = not_modified_response.elapsed
+        response.from_cache = True
+        return response
+
+    def invalidate(self, url=None):
+        with self.lock:
+            if url is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(url, None)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'bytes_saved': self.bytes_saved,
+                'size': len(self.entries)
+            }
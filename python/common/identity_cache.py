@@ -0,0 +1,88 @@
+import collections
+import copy
+import threading
+import time
+
+
+# Domain objects keyed by (list_path, id) with a (list_path, customId) index, evicted least-recently-used once
+# max_size is reached and expired ttl seconds after they were stored. Copies go in and out so callers may mutate.
+class IdentityCache(object):
+    def __init__(self, ttl=300, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.custom_id_index = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_by_id(self, list_path, domain_object_id):
+        with self.lock:
+            return self.__get((list_path, domain_object_id))
+
+    def get_by_custom_id(self, list_path, custom_id):
+        with self.lock:
+            key = self.custom_id_index.get((list_path, custom_id), None)
+            return self.__get(key)
+
+    def put(self, list_path, domain_object):
+        domain_object_id = domain_object.get('id', None) if domain_object is not None else None
+        if domain_object_id is None:
+            return
+        key = (list_path, domain_object_id)
+        entry = (time.monotonic() + self.ttl if self.ttl is not None else None, copy.deepcopy(domain_object))
+        with self.lock:
+            self.__remove(key)
+            self.entries[key] = entry
+            custom_id = domain_object.get('customId', None)
+            if custom_id is not None:
+                self.custom_id_index[(list_path, custom_id)] = key
+            while len(self.entries) > self.max_size:
+                self.__remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, list_path, domain_object_id=None):
+        with self.lock:
+            if domain_object_id is not None:
+                self.__remove((list_path, domain_object_id))
+                return
+            for key in [key for key in self.entries if key[0] == list_path]:
+                self.__remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.custom_id_index.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self.entries)
+            }
+
+    def __get(self, key):
+        entry = self.entries.get(key, None) if key is not None else None
+        if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+            self.__remove(key)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(entry[1])
+
+    def __remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        custom_id_key = (key[0], entry[1].get('customId', None))
+        if self.custom_id_index.get(custom_id_key, None) == key:
+            del self.custom_id_index[custom_id_key]
@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+
+
+# Append-only JSON lines file of finished work items, so an interrupted job can skip what it already did. Every
+# record(key, ok, **fields) is written as one line; when the journal is loaded the last line for a key wins and a
+# torn last line (the process died mid-write) is ignored. sync() flushes and fsyncs what was recorded so far.
+class Journal(object):
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        torn = False
+        if os.path.exists(self.path):
+            with open(self.path, mode='r', encoding='utf-8') as journal_file:
+                for line in journal_file:
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry['key']] = entry
+        self.journal_file = open(self.path, mode='a', encoding='utf-8')
+        if torn:
+            self.journal_file.write('\n')
+
+    def is_done(self, key):
+        entry = self.entries.get(key, None)
+        return entry is not None and entry['ok']
+
+    def get_done(self):
+        return [entry for entry in self.entries.values() if entry['ok']]
+
+    def record(self, key, ok, **fields):
+        entry = dict(fields, key=key, ok=ok)
+        with self.lock:
+            self.entries[key] = entry
+            self.journal_file.write(json.dumps(entry) + '\n')
+
+    def sync(self):
+        with self.lock:
+            self.journal_file.flush()
+            os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        with self.lock:
+            if not self.journal_file.closed:
+                self.journal_file.flush()
+                os.fsync(self.journal_file.fileno())
+                self.journal_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,121 @@
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_CHARS = re.compile(r'[0-9eE.+\-]*')
+_VALUE_START = '"{[-0123456789tfn'
+_DECODER = json.JSONDecoder()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Compact JSON as bytes
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class _NeedMore(Exception):
+    pass
+
+
+# Incrementally decodes a JSON document from an iterable of byte chunks (e.g. response.iter_content()).
+# Iterating yields the elements of the top-level array_key array one at a time (or of the document itself
+# when it is a top-level array); every other top-level member is decoded into fields. Only the current
+# chunk and the element being read are held in memory; each value is decoded by the C scanner of the json module.
+class JsonObjectStream(object):
+    def __init__(self, chunks, array_key='domainObjects'):
+        self.chunks = iter(chunks)
+        self.array_key = array_key
+        self.fields = {}
+        self.bytes_read = 0
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def __iter__(self):
+        in_object = self.__next_token('{[') == '{'
+        self.pos += 1
+        if not in_object:
+            for item in self.__iter_array():
+                yield item
+            return
+
+        token = self.__next_token('}"')
+        while token != '}':
+            key = self.__read_value()
+            self.__next_token(':')
+            self.pos += 1
+            if self.__next_token(None) == '[' and key == self.array_key:
+                self.pos += 1
+                for item in self.__iter_array():
+                    yield item
+            else:
+                self.fields[key] = self.__read_value()
+            token = self.__separator('}', '"')
+        self.pos += 1
+
+    def __iter_array(self):
+        token = self.__next_token(None)
+        while token != ']':
+            yield self.__read_value()
+            token = self.__separator(']', _VALUE_START)
+        self.pos += 1
+
+    # Consumes the ',' between members and returns the next token, or the closing token when there is none
+    def __separator(self, closing, expected_next):
+        token = self.__next_token(',' + closing)
+        if token == ',':
+            self.pos += 1
+            token = self.__next_token(expected_next)
+        return token
+
+    def __read_value(self):
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                # A number running up to the end of the buffer (e.g. '1.5e') may continue in the next chunk
+                if self.eof or _NUMBER_CHARS.match(self.buffer, end).end() < len(self.buffer):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.__fill()
+
+    def __next_token(self, expected):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                token = self.buffer[self.pos]
+                if expected is not None and token not in expected:
+                    raise ValueError('unexpected {0!r} at character {1}'.format(token, self.pos))
+                return token
+            self.__fill()
+
+    def __fill(self):
+        if self.eof:
+            raise ValueError('truncated JSON document after {0} bytes'.format(self.bytes_read))
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.bytes_read += len(chunk)
+                self.buffer += self.text_decoder.decode(chunk)
+                return
+        self.buffer += self.text_decoder.decode(b'', final=True)
+        self.eof = True
@@ -0,0 +1,179 @@
+import json
+import re
+import threading
+import urllib.parse
+
+__LATENCY_BUCKETS__ = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# UUIDs, numbers and long hex strings in a path are ids, e.g. v1/fieldvisits/{id}
+__ID_SEGMENT__ = re.compile(r'^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+|'
+                            r'[0-9a-fA-F]{16,})$')
+
+
+class _EndpointMetrics(object):
+    def __init__(self, method, template, buckets):
+        self.method = method
+        self.template = template
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_min = None
+        self.latency_max = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+        self.reused_connections = 0
+        self.new_connections = 0
+        self.status_codes = {}
+
+    def record(self, status_code, latency, bytes_in, bytes_out, retry, reused):
+        self.count += 1
+        if status_code is None:
+            self.errors += 1
+        else:
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        self.latency_sum += latency
+        self.latency_min = latency if self.latency_min is None else min(self.latency_min, latency)
+        self.latency_max = latency if self.latency_max is None else max(self.latency_max, latency)
+        for index, bound in enumerate(self.buckets):
+            if latency <= bound:
+                self.bucket_counts[index] += 1
+                break
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        if retry:
+            self.retries += 1
+        if reused is True:
+            self.reused_connections += 1
+        elif reused is False:
+            self.new_connections += 1
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {
+            'method': self.method,
+            'template': self.template,
+            'count': self.count,
+            'errors': self.errors,
+            'status_codes': dict((str(status_code), count) for status_code, count in self.status_codes.items()),
+            'latency': {
+                'sum': self.latency_sum,
+                'min': self.latency_min,
+                'max': self.latency_max,
+                'mean': self.latency_sum / self.count if self.count else None,
+                'buckets': buckets
+            },
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'retries': self.retries,
+            'reused_connections': self.reused_connections,
+            'new_connections': self.new_connections
+        }
+
+
+# Aggregates every attempt RestClient makes per endpoint template ("GET v1/fieldvisits/{id}"): latency histogram,
+# status codes, bytes in/out, retries and connection reuse. Attach with RestClient.set_metrics_collector(); read with
+# get_snapshot() or export with to_prometheus() / write_json() / write_prometheus().
+class MetricsCollector(object):
+    def __init__(self, buckets=__LATENCY_BUCKETS__):
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def after_response(self, method, url, attempt, response, error, latency, bytes_out, reused):
+        template = MetricsCollector.get_endpoint_template(url)
+        status_code = response.status_code if response is not None else None
+        bytes_in = MetricsCollector.get_response_length(response)
+        with self.lock:
+            endpoint = self.endpoints.get((method, template), None)
+            if endpoint is None:
+                endpoint = _EndpointMetrics(method, template, self.buckets)
+                self.endpoints[(method, template)] = endpoint
+            endpoint.record(status_code, latency, bytes_in, bytes_out, attempt > 1, reused)
+
+    # Endpoints ordered by total time spent, the most expensive first
+    def get_snapshot(self):
+        with self.lock:
+            endpoints = [endpoint.snapshot() for endpoint in self.endpoints.values()]
+        endpoints.sort(key=lambda endpoint: endpoint['latency']['sum'], reverse=True)
+        return {
+            'requests': sum(endpoint['count'] for endpoint in endpoints),
+            'seconds': sum(endpoint['latency']['sum'] for endpoint in endpoints),
+            'endpoints': endpoints
+        }
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def to_prometheus(self, prefix='aqs_client'):
+        lines = []
+        endpoints = self.get_snapshot()['endpoints']
+
+        def add_metric(name, metric_type, description, samples):
+            lines.append('# HELP {0}_{1} {2}'.format(prefix, name, description))
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, metric_type))
+            for suffix, labels, value in samples:
+                lines.append('{0}_{1}{2}{{{3}}} {4}'.format(prefix, name, suffix, ','.join(
+                    '{0}="{1}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"'))
+                    for key, label in labels), value))
+
+        def labels_of(endpoint, *extra):
+            return (('method', endpoint['method']), ('endpoint', endpoint['template'])) + extra
+
+        histogram = []
+        for endpoint in endpoints:
+            for bound, count in endpoint['latency']['buckets']:
+                histogram.append(('_bucket', labels_of(endpoint, ('le', repr(bound))), count))
+            histogram.append(('_bucket', labels_of(endpoint, ('le', '+Inf')), endpoint['count']))
+            histogram.append(('_sum', labels_of(endpoint), repr(endpoint['latency']['sum'])))
+            histogram.append(('_count', labels_of(endpoint), endpoint['count']))
+        add_metric('request_duration_seconds', 'histogram', 'Duration of HTTP request attempts.', histogram)
+        add_metric('responses_total', 'counter', 'HTTP responses by status code ("error" when none was received).',
+                   [('', labels_of(endpoint, ('status', status_code)), count) for endpoint in endpoints
+                    for status_code, count in sorted(endpoint['status_codes'].items())] +
+                   [('', labels_of(endpoint, ('status', 'error')), endpoint['errors']) for endpoint in endpoints
+                    if endpoint['errors']])
+        add_metric('response_bytes_total', 'counter', 'Response body bytes received.',
+                   [('', labels_of(endpoint), endpoint['bytes_in']) for endpoint in endpoints])
+        add_metric('request_bytes_total', 'counter', 'Request body bytes sent.',
+                   [('', labels_of(endpoint), endpoint['bytes_out']) for endpoint in endpoints])
+        add_metric('retries_total', 'counter', 'Request attempts that were retries.',
+                   [('', labels_of(endpoint), endpoint['retries']) for endpoint in endpoints])
+        add_metric('connections_total', 'counter', 'Connections used, new or reused from the pool.',
+                   [('', labels_of(endpoint, ('reused', 'true')), endpoint['reused_connections'])
+                    for endpoint in endpoints] +
+                   [('', labels_of(endpoint, ('reused', 'false')), endpoint['new_connections'])
+                    for endpoint in endpoints])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='aqs_client'):
+        with open(path, mode='w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.to_prometheus(prefix))
+
+    def write_json(self, path):
+        with open(path, mode='w', encoding='utf-8') as metrics_file:
+            json.dump(self.get_snapshot(), metrics_file, indent=2)
+
+    @staticmethod
+    def get_endpoint_template(url):
+        path = urllib.parse.urlsplit(url).path
+        if '/api/' in path:
+            path = path.split('/api/', 1)[1]
+        return '/'.join('{id}' if __ID_SEGMENT__.match(segment) else segment
+                        for segment in path.strip('/').split('/'))
+
+    @staticmethod
+    def get_response_length(response):
+        if response is None:
+            return 0
+        content_length = response.headers.get('Content-Length', None)
+        if content_length is not None and content_length.isdigit():
+            return int(content_length)
+        content = getattr(response, '_content', False)
+        return len(content) if isinstance(content, bytes) else 0
@@ -0,0 +1,216 @@
+from .json_stream import dumps, loads
+
+_MISSING = object()
+# Key orders seen so far, so models with the same keys in the same order share one tuple
+_KEY_ORDERS = {}
+
+
+# Compact stand-in for a domain object dict. A model built from JSON keeps its own members as compact JSON bytes and
+# only decodes them into its __slots__ on the first attribute access; one built from a dict, which is decoded
+# already, sets them in its __slots__ right away. Embedded domain objects (NESTED) are models themselves and, given a
+# shared dict, equal embedded objects are one instance shared by every model built with that dict. Members
+# are attributes named as on the wire (activity.customId, activity.fieldVisit.samplingLocation) or read like a dict
+# (activity['customId'], activity.get('comment')); a declared member the object does not have reads as None.
+# to_dict() gives back the wire format: the same members, values and member order it was built from.
+# Shared instances are referenced by many models, so change them with care.
+class DomainObject(object):
+    __slots__ = ('_raw', '_keys', '_extra')
+    FIELDS = ()
+    NESTED = {}
+
+    @classmethod
+    def from_dict(cls, data, shared=None):
+        return cls.__build(data, shared, False, False)
+
+    @classmethod
+    def from_json(cls, content, shared=None):
+        return cls.__build(loads(content), shared, False, True)
+
+    # Shared models are interned by their JSON, so they keep it; other models only keep it when built from JSON
+    @classmethod
+    def __build(cls, data, shared, intern, encode):
+        nested = {}
+        own = {}
+        for key, value in data.items():
+            model_class = cls.NESTED.get(key, None)
+            if model_class is not None and isinstance(value, dict):
+                nested[key] = model_class.__build(value, shared, shared is not None, encode)
+            else:
+                own[key] = value
+        # orjson returns bytes with room to spare; a copy is exactly as long as the JSON
+        raw = bytes(memoryview(dumps(own))) if encode or intern else None
+        keys = tuple(data)
+        keys = _KEY_ORDERS.setdefault(keys, keys)
+
+        shared_key = (cls, keys, raw) + tuple(nested.values()) if intern else None
+        if shared_key is not None:
+            model = shared.get(shared_key, None)
+            if model is not None:
+                return model
+
+        model = cls.__new__(cls)
+        model._raw = raw
+        model._keys = keys
+        model._extra = None
+        if raw is None:
+            model.__set_members(own)
+        for key, value in nested.items():
+            object.__setattr__(model, key, value)
+        if shared_key is not None:
+            shared[shared_key] = model
+        return model
+
+    # Only called for members not decoded yet or not set
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        value = self.__lookup(name)
+        if value is not _MISSING:
+            return value
+        if name in self.FIELDS:
+            return None
+        raise AttributeError('{0} has no member {1}'.format(type(self).__name__, name))
+
+    # A member assigned before the model was decoded would be overwritten by the decoding and left out of to_dict()
+    def __setattr__(self, name, value):
+        if name in self.FIELDS:
+            self.__materialize()
+        object.__setattr__(self, name, value)
+
+    def __materialize(self):
+        raw = self._raw
+        if raw is None:
+            return
+        self.__set_members(loads(raw))
+        self._raw = None
+
+    def __set_members(self, members):
+        extra = None
+        for key, value in members.items():
+            if key in self.FIELDS:
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    # For pickle and copy. Only members that are set are kept, since unset ones read as None; they are restored
+    # without __setattr__, which would decode _raw before it is restored.
+    def __getstate__(self):
+        members = {}
+        for key in self.FIELDS:
+            try:
+                members[key] = object.__getattribute__(self, key)
+            except AttributeError:
+                pass
+        return self._raw, self._keys, self._extra, members
+
+    def __setstate__(self, state):
+        raw, keys, extra, members = state
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_keys', keys)
+        object.__setattr__(self, '_extra', extra)
+        for key, value in members.items():
+            object.__setattr__(self, key, value)
+
+    def __lookup(self, key):
+        if key in self.FIELDS:
+            try:
+                return object.__getattribute__(self, key)
+            except AttributeError:
+                if self._raw is None:
+                    return _MISSING
+            self.__materialize()
+            return self.__lookup(key)
+        self.__materialize()
+        return self._extra.get(key, _MISSING) if self._extra is not None else _MISSING
+
+    def __getitem__(self, key):
+        value = self.__lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.__materialize()
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return self.__lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        value = self.__lookup(key)
+        return default if value is _MISSING else value
+
+    def keys(self):
+        return list(self.to_dict())
+
+    def to_dict(self):
+        values = loads(self._raw) if self._raw is not None else None
+        data = {}
+        for key in self._keys:
+            value = values[key] if values is not None and key in values else self.__lookup(key)
+            if value is not _MISSING:
+                data[key] = value.to_dict() if isinstance(value, DomainObject) else value
+        # Members set after the model was built
+        if values is None:
+            for key in self.FIELDS + (tuple(self._extra) if self._extra is not None else ()):
+                if key not in data:
+                    value = self.__lookup(key)
+                    if value is not _MISSING:
+                        data[key] = value.to_dict() if isinstance(value, DomainObject) else value
+        return data
+
+    def to_json(self):
+        return dumps(self.to_dict())
+
+    def __repr__(self):
+        return '{0}(id={1!r}, customId={2!r})'.format(type(self).__name__, self.get('id'), self.get('customId'))
+
+
+class SamplingLocation(DomainObject):
+    FIELDS = ('id', 'customId', 'name', 'description', 'type', 'latitude', 'longitude', 'horizontalDatum',
+              'verticalDatum', 'horizontalCollectionMethod', 'verticalCollectionMethod')
+    __slots__ = FIELDS
+
+
+class ObservedProperty(DomainObject):
+    FIELDS = ('id', 'customId', 'name', 'description', 'resultType', 'analysisType')
+    __slots__ = FIELDS
+
+
+class FieldVisit(DomainObject):
+    FIELDS = ('id', 'customId', 'samplingLocation', 'startTime', 'endTime', 'planningStatus', 'notes')
+    NESTED = {'samplingLocation': SamplingLocation}
+    __slots__ = FIELDS
+
+
+class Activity(DomainObject):
+    FIELDS = ('id', 'customId', 'samplingLocation', 'fieldVisit', 'type', 'medium', 'startTime', 'endTime',
+              'comment')
+    NESTED = {'samplingLocation': SamplingLocation, 'fieldVisit': FieldVisit}
+    __slots__ = FIELDS
+
+
+class Observation(DomainObject):
+    FIELDS = ('id', 'customId', 'samplingLocation', 'fieldVisit', 'activity', 'observedProperty', 'observedTime',
+              'resultTime', 'numericResult', 'dataClassification', 'resultStatus', 'resultGrade', 'medium',
+              'comment')
+    NESTED = {'samplingLocation': SamplingLocation, 'fieldVisit': FieldVisit, 'activity': Activity,
+              'observedProperty': ObservedProperty}
+    __slots__ = FIELDS
+
+
+MODEL_CLASSES = {
+    'samplinglocations': SamplingLocation,
+    'observedproperties': ObservedProperty,
+    'fieldvisits': FieldVisit,
+    'activities': Activity,
+    'observations': Observation
+}
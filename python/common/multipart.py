@@ -0,0 +1,107 @@
+import os
+import uuid
+
+__CHUNK_SIZE__ = 64 * 1024
+
+
+# multipart/form-data body that is produced while it is sent instead of being built in memory. Each field value
+# is str/bytes, or a (filename, source[, content_type]) tuple whose source is str/bytes, a list of them, a binary
+# file object or an iterable of str/bytes chunks (e.g. a generator). Pass it as data= with headers {'Content-Type': content_type}.
+# The length is known (and sent as Content-Length) unless a source is a generator, then the body is sent chunked.
+class MultipartEncoder(object):
+    def __init__(self, fields, boundary=None, chunk_size=__CHUNK_SIZE__):
+        self.fields = list(fields.items()) if isinstance(fields, dict) else list(fields)
+        self.boundary = boundary if boundary is not None else uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={0}'.format(self.boundary)
+        self.chunk_size = chunk_size
+        self.parts = [self.__make_part(name, value) for name, value in self.fields]
+        self.start_positions = [self.__tell(source) for _, source in self.parts]
+        self.len = self.__get_length()
+        self.iterator = None
+        self.buffer = b''
+        self.consumed = False
+
+    def __iter__(self):
+        self.consumed = True
+        for header, source in self.parts:
+            yield header
+            for chunk in self.__iter_source(source):
+                yield chunk
+            yield b'\r\n'
+        yield '--{0}--\r\n'.format(self.boundary).encode()
+
+    def read(self, size=-1):
+        if self.iterator is None:
+            self.iterator = iter(self)
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.iterator, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    # Used by RestClient before a retry; only possible when every source can seek back to where it started
+    def rewind(self):
+        if not self.consumed:
+            return
+        for (_, source), position in zip(self.parts, self.start_positions):
+            if position is None:
+                raise RuntimeError('multipart body with a generator source cannot be sent twice')
+            if hasattr(source, 'seek'):
+                source.seek(position)
+        self.iterator = None
+        self.buffer = b''
+
+    def __make_part(self, name, value):
+        if isinstance(value, tuple):
+            filename, source = value[0], value[1]
+            content_type = value[2] if len(value) > 2 else None
+        else:
+            filename, source, content_type = name, value, None
+        if isinstance(source, (list, tuple)):
+            source = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in source)
+        elif isinstance(source, str):
+            source = source.encode('utf-8')
+        header = '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\n'.format(
+            self.boundary, name, filename)
+        if content_type is not None:
+            header += 'Content-Type: {0}\r\n'.format(content_type)
+        return (header + '\r\n').encode('utf-8'), source
+
+    def __iter_source(self, source):
+        if isinstance(source, bytes):
+            yield source
+        elif hasattr(source, 'read'):
+            while True:
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            for chunk in source:
+                yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+    @staticmethod
+    def __tell(source):
+        if isinstance(source, bytes):
+            return 0
+        if hasattr(source, 'tell') and hasattr(source, 'seek'):
+            return source.tell()
+        return None
+
+    def __get_length(self):
+        length = len('--{0}--\r\n'.format(self.boundary))
+        for (header, source), position in zip(self.parts, self.start_positions):
+            if isinstance(source, bytes):
+                size = len(source)
+            elif position is not None:
+                source.seek(0, os.SEEK_END)
+                size = source.tell() - position
+                source.seek(position)
+            else:
+                return None
+            length += len(header) + size + 2
+        return length
@@ -0,0 +1,134 @@
+import csv
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from .csv_import import iter_csv_records
+
+# Identifies an observation in an observations CSV and the same observation as returned by the server
+__OBSERVATION_KEY_FIELDS__ = (
+    ('Sample ID', ('activity', 'customId')),
+    ('Observed Property ID', ('observedProperty', 'customId')),
+    ('Observed DateTime', ('observedTime',))
+)
+__OBSERVATION_KEY_COLUMNS__ = tuple(column for column, _ in __OBSERVATION_KEY_FIELDS__)
+__KEY_SEPARATOR__ = '\x1f'
+
+
+# ISO times are compared in UTC so '09:05-07:00' from the CSV matches '16:05Z' from the server. A time without an
+# offset gets default_offset_hours (the import's timeZoneOffset) when given.
+def normalize_time(value, default_offset_hours=None):
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return value
+    if parsed.tzinfo is None:
+        if default_offset_hours is None:
+            return parsed.isoformat()
+        parsed = parsed.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=float(default_offset_hours))))
+    return parsed.astimezone(datetime.timezone.utc).isoformat()
+
+
+# Returns (header records, {key: (fingerprint, record)}) in file order. The key joins the key_columns values of a
+# row (times normalized); a key seen again gets its occurrence number appended. The fingerprint hashes the row.
+def fingerprint_csv(lines, key_columns=__OBSERVATION_KEY_COLUMNS__, header_rows=1, default_offset_hours=None):
+    header = []
+    rows = {}
+    column_indexes = None
+    for record in iter_csv_records(lines):
+        if len(header) < header_rows:
+            header.append(record if record.endswith('\n') else record + '\n')
+            if column_indexes is None:
+                columns = next(csv.reader([record]))
+                missing = [column for column in key_columns if column not in columns]
+                if missing:
+                    raise RuntimeError('CSV header has no column {0}'.format(', '.join(missing)))
+                column_indexes = [columns.index(column) for column in key_columns]
+            continue
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        key_values = [values[index] if index < len(values) else '' for index in column_indexes]
+        key = __KEY_SEPARATOR__.join(normalize_time(value, default_offset_hours) if 'Time' in column else value
+                                     for value, column in zip(key_values, key_columns))
+        unique_key = key
+        occurrence = 1
+        while unique_key in rows:
+            occurrence += 1
+            unique_key = '{0}{1}{2}'.format(key, __KEY_SEPARATOR__, occurrence)
+        record = record.rstrip('\r\n') + '\n'
+        rows[unique_key] = (hashlib.sha1(record.encode('utf-8')).hexdigest(), record)
+    return header, rows
+
+
+# The key fingerprint_csv gives the row an observation was imported from
+def get_observation_key(observation, default_offset_hours=None):
+    values = []
+    for column, path in __OBSERVATION_KEY_FIELDS__:
+        value = observation
+        for field in path:
+            value = value.get(field, None) if isinstance(value, dict) else None
+        value = '' if value is None else str(value)
+        values.append(normalize_time(value, default_offset_hours) if 'Time' in column else value)
+    return __KEY_SEPARATOR__.join(values)
+
+
+# A row key without the occurrence number fingerprint_csv may have appended, as get_observation_key returns it
+def get_base_key(key):
+    return __KEY_SEPARATOR__.join(key.split(__KEY_SEPARATOR__)[:len(__OBSERVATION_KEY_FIELDS__)])
+
+
+# Compares the {key: fingerprint} of the last sync with the current ones; new, changed and removed are sets of keys
+def diff_fingerprints(previous, current):
+    return {
+        'new': set(key for key in current if key not in previous),
+        'changed': set(key for key, fingerprint in current.items() if key in previous and previous[key] != fingerprint),
+        'removed': set(key for key in previous if key not in current),
+        'unchanged': sum(1 for key, fingerprint in current.items() if previous.get(key, None) == fingerprint)
+    }
+
+
+# {namespace (tenant base_url): {sampling location id: {row key: fingerprint}}} of what was last pushed, kept in a
+# JSON file that is rewritten atomically on every put
+class ObservationManifest(object):
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, mode='r', encoding='utf-8') as manifest_file:
+                self.entries = json.load(manifest_file)
+
+    def get(self, namespace, sampling_location_id):
+        with self.lock:
+            fingerprints = self.entries.get(namespace, {}).get(sampling_location_id, None)
+            return dict(fingerprints) if fingerprints is not None else None
+
+    def put(self, namespace, sampling_location_id, fingerprints):
+        with self.lock:
+            self.entries.setdefault(namespace, {})[sampling_location_id] = dict(fingerprints)
+            self.__save()
+
+    def invalidate(self, namespace=None, sampling_location_id=None):
+        with self.lock:
+            if namespace is None:
+                self.entries.clear()
+            elif sampling_location_id is None:
+                self.entries.pop(namespace, None)
+            else:
+                self.entries.get(namespace, {}).pop(sampling_location_id, None)
+            self.__save()
+
+    def __save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix='.manifest-')
+        try:
+            with os.fdopen(descriptor, mode='w', encoding='utf-8') as manifest_file:
+                json.dump(self.entries, manifest_file)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
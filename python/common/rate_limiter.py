@@ -0,0 +1,200 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .common_logging import CommonLogging
+
+
+# Token bucket shared by every thread using the same instance: `rate` requests per second on average with
+# bursts of up to `burst` requests.
+class TokenBucketRateLimiter(object):
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    # endpoint: e.g. 'GET samplinglocations/{id}', for limiters that judge latency per endpoint
+    def record(self, status_code, latency, endpoint=None):
+        pass
+
+    def get_rate(self):
+        return self.rate
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.rate = float(rate)
+
+    def get_stats(self):
+        return {'rate': self.get_rate(), 'burst': self.burst, 'waited_seconds': self.waited}
+
+
+# Token bucket whose state lives in a small file guarded by flock, so every thread and every local process
+# pointing at the same path shares one budget (e.g. all workers hitting one tenant).
+class FileTokenBucketRateLimiter(TokenBucketRateLimiter):
+    def __init__(self, path, rate, burst=None):
+        if fcntl is None:
+            raise RuntimeError('FileTokenBucketRateLimiter requires fcntl (POSIX)')
+        TokenBucketRateLimiter.__init__(self, rate, burst)
+        self.path = path
+        descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.close(descriptor)
+
+    def acquire(self):
+        while True:
+            with self.__locked_state() as state:
+                now = time.time()
+                state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * state['rate'])
+                state['updated'] = now
+                if state['tokens'] >= 1:
+                    state['tokens'] -= 1
+                    return
+                wait = (1 - state['tokens']) / state['rate']
+            with self.lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def get_rate(self):
+        with self.__locked_state() as state:
+            return state['rate']
+
+    def set_rate(self, rate):
+        with self.__locked_state() as state:
+            state['rate'] = float(rate)
+
+    def __locked_state(self):
+        return _LockedState(self.path, self.rate, self.burst)
+
+
+class _LockedState(dict):
+    def __init__(self, path, rate, burst):
+        dict.__init__(self)
+        self.path = path
+        self.defaults = {'tokens': burst, 'updated': time.time(), 'rate': rate}
+        self.state_file = None
+
+    def __enter__(self):
+        self.state_file = open(self.path, 'r+')
+        fcntl.flock(self.state_file, fcntl.LOCK_EX)
+        values = self.state_file.read().split()
+        if len(values) == 3:
+            self.update(zip(('tokens', 'updated', 'rate'), [float(value) for value in values]))
+        else:
+            self.update(self.defaults)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.state_file.seek(0)
+            self.state_file.truncate()
+            self.state_file.write('{0!r} {1!r} {2!r}'.format(self['tokens'], self['updated'], self['rate']))
+            self.state_file.flush()
+        finally:
+            fcntl.flock(self.state_file, fcntl.LOCK_UN)
+            self.state_file.close()
+
+
+# Wraps a token bucket and adjusts its rate from what the server reports (AIMD): the rate is multiplied by
+# decrease_factor on a 429/503 or when the smoothed latency of an endpoint exceeds latency_factor times the best
+# latency seen for that endpoint, and grows by increase_step after every increase_after fast responses, within
+# [min_rate, max_rate]. Latency is tracked per endpoint so a slow import next to fast searches is not mistaken for
+# an overloaded server.
+class AdaptiveRateLimiter(object):
+    THROTTLE_STATUS_CODES = (429, 503)
+
+    def __init__(self, limiter, min_rate, max_rate, increase_step=1.0, increase_after=20, decrease_factor=0.5,
+                 latency_factor=2.0, cooldown=1.0):
+        self.logger = CommonLogging.get_logger("AdaptiveRateLimiter")
+        if min_rate <= 0:
+            raise RuntimeError('min_rate must be positive, got {0}'.format(min_rate))
+        if max_rate < min_rate:
+            raise RuntimeError('max_rate {0} is below min_rate {1}'.format(max_rate, min_rate))
+        self.limiter = limiter
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase_step = increase_step
+        self.increase_after = increase_after
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        # {endpoint: [smoothed latency, best smoothed latency]}
+        self.latencies = {}
+        self.fast_responses = 0
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    def acquire(self):
+        self.limiter.acquire()
+
+    # status_code is None when the attempt failed without a response
+    def record(self, status_code, latency, endpoint=None):
+        if status_code is None:
+            return
+        with self.lock:
+            slow = False
+            if latency is not None:
+                latencies = self.latencies.get(endpoint, None)
+                if latencies is None:
+                    latencies = self.latencies[endpoint] = [latency, latency]
+                else:
+                    latencies[0] = 0.8 * latencies[0] + 0.2 * latency
+                    latencies[1] = min(latencies[1], latencies[0])
+                slow = latencies[0] > latencies[1] * self.latency_factor
+
+            throttled = status_code in AdaptiveRateLimiter.THROTTLE_STATUS_CODES
+            now = time.monotonic()
+            if throttled or slow:
+                self.fast_responses = 0
+                if now - self.last_decrease >= self.cooldown:
+                    self.last_decrease = now
+                    self.__set_rate(max(self.min_rate, self.limiter.get_rate() * self.decrease_factor))
+                    self.decreases += 1
+                return
+
+            self.fast_responses += 1
+            if self.fast_responses >= self.increase_after:
+                self.fast_responses = 0
+                rate = self.limiter.get_rate()
+                if rate < self.max_rate:
+                    self.__set_rate(min(self.max_rate, rate + self.increase_step))
+                    self.increases += 1
+
+    def __set_rate(self, rate):
+        self.logger.debug('rate limit set to %.2f requests/s', rate)
+        self.limiter.set_rate(rate)
+
+    def get_rate(self):
+        return self.limiter.get_rate()
+
+    def set_rate(self, rate):
+        self.limiter.set_rate(rate)
+
+    def get_stats(self):
+        stats = self.limiter.get_stats()
+        with self.lock:
+            latencies = dict((endpoint, {'smoothed_latency': smoothed_latency, 'best_latency': best_latency})
+                             for endpoint, (smoothed_latency, best_latency) in self.latencies.items())
+        stats.update({'increases': self.increases, 'decreases': self.decreases, 'latencies': latencies})
+        return stats
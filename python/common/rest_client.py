@@ -1,17 +1,150 @@
+import gzip
 import json
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.poolmanager import PoolManager
+from urllib3.util import make_headers
 
 from .common_logging import CommonLogging
+from .json_stream import loads
+from .metrics import MetricsCollector
 
+# gzip and deflate, plus br/zstd when a decoder for them is installed
+__ACCEPT_ENCODING__ = make_headers(accept_encoding=True)['accept-encoding']
 
-class RestClient(object):
+
+class ConnectionStats(object):
     def __init__(self):
+        self.lock = threading.Lock()
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.idle_expired_connections = 0
+        self.local = threading.local()
+
+    def record(self, reused):
+        self.local.reused = reused
+        with self.lock:
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+
+    def record_idle_expired(self):
+        with self.lock:
+            self.idle_expired_connections += 1
+
+    # Whether the last connection taken by the calling thread came from the pool (None when none was taken since
+    # clear_last)
+    def get_last(self):
+        return getattr(self.local, 'reused', None)
+
+    def clear_last(self):
+        self.local.reused = None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections,
+                'idle_expired_connections': self.idle_expired_connections
+            }
+
+
+class _TrackingPoolMixin(object):
+    # Set by _TrackingPoolManager right after the pool is created
+    connection_stats = None
+    keep_alive_timeout = None
+
+    def _get_conn(self, timeout=None):
+        conn = super(_TrackingPoolMixin, self)._get_conn(timeout)
+        last_used = getattr(conn, 'aqs_last_used', None)
+        if conn.sock is not None and self.keep_alive_timeout is not None and last_used is not None \
+                and time.monotonic() - last_used > self.keep_alive_timeout:
+            conn.close()
+            if self.connection_stats is not None:
+                self.connection_stats.record_idle_expired()
+        if self.connection_stats is not None:
+            self.connection_stats.record(reused=conn.sock is not None)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn.aqs_last_used = time.monotonic()
+        super(_TrackingPoolMixin, self)._put_conn(conn)
+
+
+class _TrackingHTTPConnectionPool(_TrackingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackingHTTPSConnectionPool(_TrackingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _TrackingPoolManager(PoolManager):
+    def __init__(self, connection_stats, keep_alive_timeout, **kwargs):
+        PoolManager.__init__(self, **kwargs)
+        self.connection_stats = connection_stats
+        self.keep_alive_timeout = keep_alive_timeout
+        self.pool_classes_by_scheme = {
+            'http': _TrackingHTTPConnectionPool,
+            'https': _TrackingHTTPSConnectionPool
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = PoolManager._new_pool(self, scheme, host, port, request_context=request_context)
+        pool.connection_stats = self.connection_stats
+        pool.keep_alive_timeout = self.keep_alive_timeout
+        return pool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def __init__(self, pool_connections, pool_maxsize, pool_block=False, keep_alive_timeout=None,
+                 connection_stats=None):
+        self.keep_alive_timeout = keep_alive_timeout
+        self.connection_stats = connection_stats if connection_stats is not None else ConnectionStats()
+        HTTPAdapter.__init__(self, pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                             pool_block=pool_block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _TrackingPoolManager(
+            self.connection_stats, self.keep_alive_timeout,
+            num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+
+class RestClient(object):
+    HOOK_EVENTS = ('before_request', 'after_response')
+
+    # pool_connections: number of per-host pools kept, pool_maxsize: connections kept per host,
+    # keep_alive_timeout: seconds an idle connection may sit in the pool before it is re-opened
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive_timeout=None):
         self.logger = CommonLogging.get_logger("RestClient")
         self.response = None
         self.default_headers = None
         self.verify = False
         self.cert = None
+        self.retry_policy = None
+        self.rate_limiter = None
+        self.http_cache = None
+        self.request_compression_min_size = None
+        self.hooks = dict((event, []) for event in RestClient.HOOK_EVENTS)
+        self.metrics_collector = None
+
+        self.connection_stats = ConnectionStats()
+        self.adapter = PooledHTTPAdapter(pool_connections, pool_maxsize, pool_block=pool_block,
+                                         keep_alive_timeout=keep_alive_timeout,
+                                         connection_stats=self.connection_stats)
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = __ACCEPT_ENCODING__
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
 
     def set_verify(self, verify):
         self.verify = verify
@@ -24,6 +157,63 @@ class RestClient(object):
     def set_default_headers(self, headers):
         self.default_headers = headers
 
+    # E.g. set_retry_policy(RetryPolicy(max_attempts=5, circuit_breaker=CircuitBreaker()))
+    def set_retry_policy(self, retry_policy):
+        self.retry_policy = retry_policy
+
+    # E.g. set_rate_limiter(TokenBucketRateLimiter(rate=20, burst=40)); share one limiter (or a
+    # FileTokenBucketRateLimiter on the same path) between clients to give them a common budget
+    def set_rate_limiter(self, rate_limiter):
+        self.rate_limiter = rate_limiter
+
+    # E.g. set_http_cache(HttpCache()) to revalidate GETs with If-None-Match/If-Modified-Since and serve 304s locally
+    def set_http_cache(self, http_cache):
+        self.http_cache = http_cache
+
+    # gzip POST/PUT bodies of at least min_size bytes (None disables). Turned off again if the server answers 415.
+    def set_request_compression(self, min_size=16 * 1024):
+        self.request_compression_min_size = min_size
+
+    # Called for every attempt, retries included:
+    #   before_request(method, url, attempt)
+    #   after_response(method, url, attempt, response, error, latency, bytes_out, reused)
+    # response is None and error set when no response was received; reused tells whether a pooled connection was used
+    def add_hook(self, event, hook):
+        if event not in self.hooks:
+            raise RuntimeError('unknown hook event {0}, expected one of {1}'.format(
+                event, ', '.join(RestClient.HOOK_EVENTS)))
+        self.hooks[event].append(hook)
+
+    def remove_hook(self, event, hook):
+        if hook in self.hooks.get(event, []):
+            self.hooks[event].remove(hook)
+
+    # E.g. set_metrics_collector(MetricsCollector()) for per-endpoint latency histograms, bytes, statuses and retries
+    def set_metrics_collector(self, metrics_collector):
+        if self.metrics_collector is not None:
+            self.remove_hook('after_response', self.metrics_collector.after_response)
+        self.metrics_collector = metrics_collector
+        if metrics_collector is not None:
+            self.add_hook('after_response', metrics_collector.after_response)
+
+    def get_metrics(self):
+        return self.metrics_collector.get_snapshot() if self.metrics_collector is not None else {}
+
+    def get_retry_stats(self):
+        return self.retry_policy.get_stats() if self.retry_policy is not None else {}
+
+    def get_connection_stats(self):
+        return self.connection_stats.snapshot()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def __get_headers(self, headers=None):
         request_headers = self.default_headers
         if headers is not None:
@@ -36,12 +226,117 @@ class RestClient(object):
             return None
         return json.dumps(data)
 
-    def handle_error(self):
-        if 200 <= self.response.status_code < 300:
+    def __request(self, method, url, **kwargs):
+        response = self.__send(method, url, **kwargs)
+        self.response = response
+        self.handle_error(response)
+        return response
+
+    def __send(self, method, url, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            if self.retry_policy is not None:
+                self.retry_policy.before_request(url)
+            # An attempt that ends before the retry policy saw its outcome (a hook or the rate limiter raised) is
+            # recorded as ignored, so a half open circuit breaker does not wait for its probe forever
+            recorded = self.retry_policy is None
+            try:
+                if self.retry_policy is not None and attempt > 1:
+                    RestClient.__rewind(kwargs)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                for hook in self.hooks['before_request']:
+                    hook(method, url, attempt)
+                self.connection_stats.clear_last()
+                started = time.monotonic()
+                try:
+                    response = self.session.request(method, url, verify=self.verify, cert=self.cert, **kwargs)
+                except Exception as error:
+                    self.__after_response(method, url, attempt, None, error, time.monotonic() - started)
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.record(None, None)
+                    if self.retry_policy is None:
+                        raise
+                    recorded = True
+                    delay = self.retry_policy.get_retry_delay(method, url, attempt, error=error)
+                    if delay is None:
+                        raise
+                else:
+                    latency = time.monotonic() - started
+                    self.__after_response(method, url, attempt, response, None, latency)
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.record(response.status_code, latency, endpoint='{0} {1}'.format(
+                            method, MetricsCollector.get_endpoint_template(url)))
+                    if self.retry_policy is None:
+                        break
+                    recorded = True
+                    delay = self.retry_policy.get_retry_delay(method, url, attempt, response=response)
+                    if delay is None:
+                        break
+                    response.close()
+            finally:
+                if not recorded:
+                    self.retry_policy.record_ignored()
+            time.sleep(delay)
+        return response
+
+    def __after_response(self, method, url, attempt, response, error, latency):
+        if not self.hooks['after_response']:
+            return
+        bytes_out = RestClient.__get_body_length(response.request.body) if response is not None else 0
+        reused = self.connection_stats.get_last()
+        for hook in self.hooks['after_response']:
+            hook(method, url, attempt, response, error, latency, bytes_out, reused)
+
+    @staticmethod
+    def __get_body_length(body):
+        if body is None:
+            return 0
+        if isinstance(body, str):
+            return len(body.encode('utf-8'))
+        if isinstance(body, bytes):
+            return len(body)
+        length = getattr(body, 'len', None)
+        return length if isinstance(length, int) else 0
+
+    def __send_body(self, method, url, data, headers):
+        body = self.__get_data(data)
+        min_size = self.request_compression_min_size
+        if body is None or min_size is None or len(body) < min_size:
+            return self.__request(method, url, headers=headers, data=body)
+
+        compressed_headers = dict(headers or {})
+        compressed_headers['Content-Encoding'] = 'gzip'
+        response = self.__send(method, url, headers=compressed_headers, data=gzip.compress(body.encode('utf-8')))
+        if response.status_code == 415:
+            self.logger.info('server does not accept compressed request bodies, sending them uncompressed')
+            self.request_compression_min_size = None
+            response = self.__send(method, url, headers=headers, data=body)
+        self.response = response
+        self.handle_error(response)
+        return response
+
+    # File bodies are read by the previous attempt, so they are rewound before a retry
+    @staticmethod
+    def __rewind(kwargs):
+        bodies = list((kwargs.get('files', None) or {}).values()) + [kwargs.get('data', None)]
+        for body in bodies:
+            file_object = body[1] if isinstance(body, tuple) else body
+            if hasattr(file_object, 'rewind'):
+                file_object.rewind()
+            elif hasattr(file_object, 'seek'):
+                file_object.seek(0)
+
+    def handle_error(self, response=None):
+        if response is None:
+            response = self.response
+        if 200 <= response.status_code < 300:
             return
 
-        response_object = json.loads(self.response.text)
-        if self.response.status_code == 409 and 'errorCode' not in response_object:
+        response_object = loads(response.content)
+        if response.status_code == 409 and 'errorCode' not in response_object:
             # Import cases
             return
 
@@ -51,38 +346,50 @@ class RestClient(object):
             self.logger.error(response_object['stackTrace'])
             raise RuntimeError(message)
         else:
-            raise RuntimeError(self.response.reason)
+            raise RuntimeError(response.reason)
 
-    def get(self, url, headers=None):
+    # With stream=True the body is left unread so it can be consumed incrementally via response.iter_content()
+    def get(self, url, headers=None, stream=False):
         self.logger.debug('get: %s', url)
-        self.response = requests.get(
-            url, headers=self.__get_headers(headers), verify=self.verify, cert=self.cert)
-        self.handle_error()
-        return self.response
+        request_headers = self.__get_headers(headers)
+        if self.http_cache is None or stream:
+            return self.__request('GET', url, headers=request_headers, stream=stream)
+
+        conditional_headers = self.http_cache.get_conditional_headers(url)
+        if conditional_headers:
+            request_headers = dict(request_headers or {})
+            request_headers.update(conditional_headers)
+        response = self.__send('GET', url, headers=request_headers)
+        if response.status_code == 304:
+            cached_response = self.http_cache.get_cached_response(url, response)
+            if cached_response is not None:
+                self.response = cached_response
+                return cached_response
+            response = self.__send('GET', url, headers=self.__get_headers(headers))
+        self.response = response
+        self.handle_error(response)
+        if response.status_code == 200:
+            self.http_cache.store(url, response)
+        return response
 
     def post(self, url, data=None, headers=None):
         self.logger.debug('post: %s', url)
-        self.response = requests.post(
-            url, headers=self.__get_headers(headers), data=self.__get_data(data), verify=self.verify, cert=self.cert)
-        self.handle_error()
-        return self.response
+        return self.__send_body('POST', url, data, self.__get_headers(headers))
 
     def put(self, url, data=None, headers=None):
         self.logger.debug('put: %s', url)
-        self.response = requests.put(
-            url, headers=self.__get_headers(headers), data=self.__get_data(data), verify=self.verify, cert=self.cert)
-        self.handle_error()
-        return self.response
+        return self.__send_body('PUT', url, data, self.__get_headers(headers))
 
     def delete(self, url, headers=None):
         self.logger.debug('delete: %s', url)
-        self.response = requests.delete(
-            url, headers=self.__get_headers(headers), verify=self.verify, cert=self.cert)
-        self.handle_error()
-        return self.response
+        return self.__request('DELETE', url, headers=self.__get_headers(headers))
 
     def post_file(self, url, files):
         self.logger.debug('post files: %s', url)
-        self.response = requests.post(url, files=files, verify=self.verify, cert=self.cert)
-        self.handle_error()
-        return self.response
+        return self.__request('POST', url, files=files)
+
+    # Streams a MultipartEncoder body instead of building it in memory
+    def post_multipart(self, url, multipart_encoder):
+        self.logger.debug('post multipart: %s', url)
+        return self.__request('POST', url, data=multipart_encoder,
+                              headers={'Content-Type': multipart_encoder.content_type})
@@ -0,0 +1,184 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+from .common_logging import CommonLogging
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+# Opens after failure_threshold consecutive failed attempts; while open every request fails fast with
+# CircuitOpenError. After reset_timeout seconds a single probe request is let through (others keep failing fast
+# until it is answered) and its result decides whether it closes or re-opens. A 429 is throttling rather than a
+# failing server, so it is left to the retry backoff and counts neither way.
+class CircuitBreaker(object):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = CircuitBreaker.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_request(self, url):
+        with self.lock:
+            if self.state == CircuitBreaker.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError('circuit is open after {0} consecutive failures, not calling {1}'.format(
+                        self.consecutive_failures, url))
+                self.state = CircuitBreaker.HALF_OPEN
+            if self.state == CircuitBreaker.HALF_OPEN:
+                if self.probing:
+                    self.rejected += 1
+                    raise CircuitOpenError('circuit is half open and waiting for its probe request, not calling '
+                                           '{0}'.format(url))
+                self.probing = True
+
+    def record_success(self):
+        with self.lock:
+            self.state = CircuitBreaker.CLOSED
+            self.consecutive_failures = 0
+            self.probing = False
+
+    # The attempt neither succeeded nor failed (e.g. a 429); in half open state the next request probes again
+    def record_ignored(self):
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.probing = False
+            self.consecutive_failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or \
+                    (self.state == CircuitBreaker.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected
+            }
+
+
+# Decides whether RestClient retries an attempt and how long it waits first: exponential backoff
+# (backoff_factor * 2 ** (attempt - 1), capped at max_backoff) with full jitter, or the server's Retry-After.
+# Only idempotent methods are retried unless retry_post is set.
+class RetryPolicy(object):
+    IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+    RETRY_STATUS_CODES = (408, 429, 502, 503, 504)
+    RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError)
+
+    def __init__(self, max_attempts=4, backoff_factor=0.5, max_backoff=30, jitter=True, retry_post=False,
+                 status_codes=RETRY_STATUS_CODES, max_retry_after=300, circuit_breaker=None):
+        self.logger = CommonLogging.get_logger("RetryPolicy")
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_post = retry_post
+        self.status_codes = status_codes
+        self.max_retry_after = max_retry_after
+        self.circuit_breaker = circuit_breaker
+        self.lock = threading.Lock()
+        self.attempts = 0
+        self.retries = 0
+        self.retries_by_reason = {}
+        self.exhausted = 0
+
+    def before_request(self, url):
+        with self.lock:
+            self.attempts += 1
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_request(url)
+
+    # The attempt ended without an outcome to judge, e.g. a request hook raised before it was sent
+    def record_ignored(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_ignored()
+
+    def is_retryable_method(self, method):
+        return method.upper() in RetryPolicy.IDEMPOTENT_METHODS or (self.retry_post and method.upper() == 'POST')
+
+    def is_failure(self, response=None, error=None):
+        return error is not None or response.status_code >= 500 or response.status_code in self.status_codes
+
+    # Returns the seconds to wait before the next attempt, or None when the attempt must not be retried
+    def get_retry_delay(self, method, url, attempt, response=None, error=None):
+        failed = self.is_failure(response, error)
+        if self.circuit_breaker is not None:
+            if response is not None and response.status_code == 429:
+                self.circuit_breaker.record_ignored()
+            elif failed:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+        if error is not None:
+            retryable = isinstance(error, RetryPolicy.RETRY_EXCEPTIONS)
+            reason = type(error).__name__
+        else:
+            retryable = response.status_code in self.status_codes
+            reason = str(response.status_code)
+        if not retryable or not self.is_retryable_method(method):
+            return None
+        if attempt >= self.max_attempts:
+            with self.lock:
+                self.exhausted += 1
+            self.logger.warning('giving up %s %s after %d attempts (%s)', method, url, attempt, reason)
+            return None
+
+        delay = self.get_retry_after(response)
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff_factor * (2 ** (attempt - 1)))
+            if self.jitter:
+                delay = random.uniform(0, delay)
+        with self.lock:
+            self.retries += 1
+            self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+        self.logger.info('retrying %s %s in %.2fs (attempt %d, %s)', method, url, delay, attempt, reason)
+        return delay
+
+    def get_retry_after(self, response):
+        value = response.headers.get('Retry-After', None) if response is not None else None
+        if value is None:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = retry_at.timestamp() - time.time()
+        return min(max(delay, 0), self.max_retry_after)
+
+    def get_stats(self):
+        with self.lock:
+            stats = {
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'retries_by_reason': dict(self.retries_by_reason),
+                'exhausted': self.exhausted
+            }
+        if self.circuit_breaker is not None:
+            stats['circuit_breaker'] = self.circuit_breaker.get_stats()
+        return stats
@@ -1,16 +1,36 @@
-import json
+import concurrent.futures
 import ntpath
+import threading
+import time
 import urllib.parse
 import uuid
 
+from .bulk import run_bulk
+from .cascade_delete import CascadeDeleter
 from .common_logging import CommonLogging
+from .csv_import import merge_import_reports, split_csv
+from .exchange_configuration import diff_exchange_configuration, has_changes, merge_exchange_configuration
+from .json_stream import JsonObjectStream, loads
+from .models import MODEL_CLASSES, DomainObject
+from .multipart import MultipartEncoder
+from .observation_sync import diff_fingerprints, fingerprint_csv, get_base_key, get_observation_key
 from .rest_client import RestClient
 
 __CREATED_BY__ = 'Created by AQSRestClient'
+__DEFAULT_PAGE_SIZE__ = 1000
+__STREAM_CHUNK_SIZE__ = 64 * 1024
+__MAX_URL_LENGTH__ = 2000
+# URL length kept free for the '&cursor=...' that requests of later pages add
+__CURSOR_PARAM_LENGTH__ = 200
+__REFERENCE_LIST_PATHS__ = ('analysismethods', 'collectionmethods', 'exchangeconfigurations', 'laboratories',
+                            'mediums', 'observedproperties', 'unitgroups', 'units')
 
 
 class SampleClient(object):
-    def __init__(self, token, base_url):
+    # Pass a shared rest_client to reuse its pooled keep-alive connections across SampleClients of the same tenant.
+    # A rest_client already set up for another token or other TLS settings is refused, since its settings apply to
+    # every request it sends.
+    def __init__(self, token, base_url, rest_client=None):
         assert token is not None, 'token is required to instantiate SampleClient'
         assert base_url is not None, 'base_url is required to instantiate SampleClient'
 
@@ -18,28 +38,46 @@ class SampleClient(object):
         self.token = token
         self.base_url = base_url
 
-        self.logger.info('token: %s', self.token)
+        self.logger.info('token: %s', CommonLogging.mask_secret(self.token))
         self.logger.info('baseUrl: %s', self.base_url)
 
-        self.rest_client = RestClient()
-        self.rest_client.set_default_headers({
+        self.rest_client = rest_client if rest_client is not None else RestClient()
+        self.streaming_json = False
+        self.identity_cache = None
+        self.disk_cache = None
+        self.disk_cache_list_paths = ()
+        self.status_lock = threading.Lock()
+        self.status = None
+        self.status_checked_at = None
+        default_headers = {
             'Content-Type': 'application/json',
             'Authorization': 'token ' + self.token
-        })
-        if 'debug.gaiaserve.net' in self.base_url:
-            self.rest_client.set_verify('../resources/gaia-sm-ca-chain.cert.pem')
-        elif '.gaiaserve.net' in self.base_url:
-            self.rest_client.set_verify(True)
-            self.rest_client.set_cert(('../resources/gaiaserve-net.cert.pem', '../resources/gaiaserve-net.key.pem'))
-        elif '.aqsamples.com' in self.base_url:
-            self.rest_client.set_verify(True)
-
-    def check_availability(self):
-        response = self.rest_client.get(self.get_url('status'))
-        status_object = json.loads(response.text)
-        if 'releaseName' not in status_object:
-            raise RuntimeError('Target sample tenant {0} is not available.'.format(self.base_url))
-        return status_object
+        }
+        verify, cert = SampleClient.get_tls_settings(self.base_url)
+        verify = verify if verify is not None else self.rest_client.verify
+        cert = cert if cert is not None else self.rest_client.cert
+        if self.rest_client.default_headers is not None and (
+                self.rest_client.default_headers != default_headers or self.rest_client.verify != verify or
+                self.rest_client.cert != cert):
+            raise ValueError('rest_client is set up for another token or TLS settings than {0}'.format(
+                self.base_url))
+        self.rest_client.set_default_headers(default_headers)
+        self.rest_client.set_verify(verify)
+        self.rest_client.set_cert(cert)
+
+    # With max_age, a status the tenant returned less than max_age seconds ago is returned without asking again;
+    # concurrent callers wait for one status request instead of sending their own
+    def check_availability(self, max_age=None):
+        with self.status_lock:
+            if max_age is not None and self.status is not None and time.monotonic() - self.status_checked_at < max_age:
+                return self.status
+            response = self.rest_client.get(self.get_url('status'))
+            status_object = loads(response.content)
+            if 'releaseName' not in status_object:
+                raise RuntimeError('Target sample tenant {0} is not available.'.format(self.base_url))
+            self.status = status_object
+            self.status_checked_at = time.monotonic()
+            return status_object
 
     def get_url(self, list_path, params=None, domain_object_id=None, version='v1', with_token=False):
         url = SampleClient.url_join(self.base_url, version, list_path)
@@ -51,34 +89,180 @@ class SampleClient(object):
             query_params.update(params)
         if len(query_params) > 0:
             query_string_sep = '&' if '?' in url else '?'
-            url += query_string_sep + urllib.parse.urlencode(query_params)
+            url += query_string_sep + urllib.parse.urlencode(query_params, doseq=True)
 
         return url
 
+    def close(self):
+        self.rest_client.close()
+
+    # E.g. set_identity_cache(IdentityCache(ttl=600, max_size=50000)) so repeated customId lookups skip the server
+    def set_identity_cache(self, identity_cache):
+        self.identity_cache = identity_cache
+
+    # E.g. set_disk_cache(DiskCache()) so searches of rarely changing reference lists are answered from disk, also by
+    # later processes. Writes through this client invalidate the list_path they touch.
+    def set_disk_cache(self, disk_cache, list_paths=__REFERENCE_LIST_PATHS__):
+        self.disk_cache = disk_cache
+        self.disk_cache_list_paths = tuple(list_paths)
+
+    # When enabled, iter_domain_objects decodes each page incrementally from the response byte stream
+    def set_streaming_json(self, streaming_json):
+        self.streaming_json = streaming_json
+
     '''Generic domain object methods'''
-    def get_search_result(self, list_path, params=None, version='v1'):
+    # use_disk_cache=False reads from the server also when the list is disk cached, e.g. before updating it
+    def get_search_result(self, list_path, params=None, version='v1', use_disk_cache=True):
+        url = self.get_url(list_path, params=params, version=version)
+        if self.disk_cache is None or list_path not in self.disk_cache_list_paths or not use_disk_cache:
+            return loads(self.rest_client.get(url).content)
+
+        content = self.disk_cache.get(self.base_url, url)
+        if content is None:
+            content = self.rest_client.get(url).content
+            self.disk_cache.put(self.base_url, list_path, url, content)
+        return loads(content)
+
+    # Decodes the search result while it is downloaded: iterating yields the domainObjects one by one and the
+    # remaining top-level members (totalCount, cursor, ...) are available in .fields once iteration is done.
+    def stream_search_result(self, list_path, params=None, version='v1', chunk_size=__STREAM_CHUNK_SIZE__):
         url = self.get_url(list_path, params=params, version=version)
-        response = self.rest_client.get(url)
-        return json.loads(response.text)
+        response = self.rest_client.get(url, stream=True)
+        return JsonObjectStream(SampleClient.iter_response_content(response, chunk_size))
+
+    # Yields every domain object of a search, following the server cursor (or offset when no cursor is returned)
+    # one page at a time. With prefetch=True the next page is requested while the caller handles the current one;
+    # prefetch does not apply when streaming_json is enabled since a page is then read as it is consumed.
+    def iter_domain_objects(self, list_path, params=None, page_size=__DEFAULT_PAGE_SIZE__, prefetch=False,
+                            version='v1'):
+        page_params = {} if params is None else dict(params)
+        page_params['limit'] = page_size
+        if self.streaming_json:
+            yield from self.__iter_streamed_pages(list_path, page_params, version)
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            pending = self.__fetch_page(executor, list_path, page_params, version)
+            while pending is not None:
+                page = pending.result() if executor is not None else pending
+                domain_objects = page.get('domainObjects', [])
+                page_params = SampleClient.get_next_page_params(page_params, page) if domain_objects else None
+                pending = None
+                del page
+                if page_params is not None and executor is not None:
+                    pending = self.__fetch_page(executor, list_path, page_params, version)
+                for domain_object in domain_objects:
+                    yield domain_object
+                del domain_objects
+                if page_params is not None and executor is None:
+                    pending = self.__fetch_page(executor, list_path, page_params, version)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    # Like iter_domain_objects, but yields compact models (see models.DomainObject) instead of dicts. Equal embedded
+    # objects, e.g. the field visit and sampling location of activities, are one shared instance per call, or across
+    # calls given the same shared dict.
+    def iter_models(self, list_path, params=None, model_class=None, shared=None, **kwargs):
+        model_class = model_class if model_class is not None else MODEL_CLASSES.get(list_path, DomainObject)
+        shared = shared if shared is not None else {}
+        for domain_object in self.iter_domain_objects(list_path, params=params, **kwargs):
+            yield model_class.from_dict(domain_object, shared)
+
+    def __iter_streamed_pages(self, list_path, page_params, version):
+        while page_params is not None:
+            stream = self.stream_search_result(list_path, params=page_params, version=version)
+            page_length = 0
+            for domain_object in stream:
+                page_length += 1
+                yield domain_object
+            page_params = SampleClient.get_next_page_params(page_params, stream.fields, page_length) \
+                if page_length > 0 else None
+
+    def __fetch_page(self, executor, list_path, params, version):
+        if executor is None:
+            return self.get_search_result(list_path, params=params, version=version)
+        return executor.submit(self.get_search_result, list_path, params=dict(params), version=version)
 
     def get_domain_object_by_custom_id(self, list_path, custom_id, raise_error_when_custom_id_is_unused=False,
                                        version='v1'):
-        search_result = self.get_search_result(list_path, params={'customId': custom_id}, version=version)
-        for domain_object in search_result['domainObjects']:
+        if self.identity_cache is not None:
+            domain_object = self.identity_cache.get_by_custom_id(list_path, custom_id)
+            if domain_object is not None:
+                return domain_object
+        for domain_object in self.iter_domain_objects(list_path, params={'customId': custom_id}, version=version):
             if custom_id == domain_object['customId']:
+                self.__cache(list_path, domain_object)
                 return domain_object
         if raise_error_when_custom_id_is_unused:
             raise RuntimeError('domain object {0} with customId {1} is not exist.'.format(list_path, custom_id))
         return None
 
+    # Resolves many customIds with as few searches as possible: the ids are sent as repeated customId filters,
+    # chunked so no request URL exceeds max_url_length. An id the chunked searches do not return is looked up on its
+    # own before it is taken as unused. Returns {customId: domain object or None}.
+    def get_domain_objects_by_custom_ids(self, list_path, custom_ids, raise_error_when_custom_id_is_unused=False,
+                                         version='v1', max_url_length=__MAX_URL_LENGTH__):
+        custom_ids = list(dict.fromkeys(custom_ids))
+        domain_objects = {}
+        unresolved_custom_ids = []
+        for custom_id in custom_ids:
+            domain_object = None
+            if self.identity_cache is not None:
+                domain_object = self.identity_cache.get_by_custom_id(list_path, custom_id)
+            if domain_object is not None:
+                domain_objects[custom_id] = domain_object
+            else:
+                unresolved_custom_ids.append(custom_id)
+
+        for custom_id_chunk in self.__chunk_custom_ids(list_path, unresolved_custom_ids, version, max_url_length):
+            wanted_custom_ids = set(custom_id_chunk)
+            for domain_object in self.iter_domain_objects(list_path, params={'customId': custom_id_chunk},
+                                                          version=version):
+                custom_id = domain_object.get('customId', None)
+                if custom_id in wanted_custom_ids and custom_id not in domain_objects:
+                    domain_objects[custom_id] = domain_object
+                    self.__cache(list_path, domain_object)
+
+        for custom_id in unresolved_custom_ids:
+            if custom_id not in domain_objects:
+                domain_object = self.get_domain_object_by_custom_id(list_path, custom_id, version=version)
+                if domain_object is not None:
+                    domain_objects[custom_id] = domain_object
+
+        missing_custom_ids = [custom_id for custom_id in custom_ids if custom_id not in domain_objects]
+        if missing_custom_ids and raise_error_when_custom_id_is_unused:
+            raise RuntimeError('domain objects {0} with customIds {1} are not exist.'.format(
+                list_path, ', '.join(missing_custom_ids)))
+        return {custom_id: domain_objects.get(custom_id, None) for custom_id in custom_ids}
+
+    def __chunk_custom_ids(self, list_path, custom_ids, version, max_url_length):
+        base_length = len(self.get_url(list_path, params={'limit': __DEFAULT_PAGE_SIZE__}, version=version)) + \
+            __CURSOR_PARAM_LENGTH__
+        chunk = []
+        url_length = base_length
+        for custom_id in custom_ids:
+            param_length = len(urllib.parse.urlencode({'customId': custom_id})) + 1
+            if chunk and url_length + param_length > max_url_length:
+                yield chunk
+                chunk = []
+                url_length = base_length
+            chunk.append(custom_id)
+            url_length += param_length
+        if chunk:
+            yield chunk
+
     def get_domain_object_by_id(self, list_path, domain_object_id, params=None, version='v1'):
         url = self.get_url(list_path, params=params, domain_object_id=domain_object_id, version=version)
         return self.rest_client.get(url)
 
     def post_domain_object(self, list_path, domain_object, params=None, version='v1'):
         url = self.get_url(list_path, params=params, version=version)
-        response = self.rest_client.post(url, data=domain_object)
-        domain_object = json.loads(response.text)
+        response = self.rest_client.post(url, data=SampleClient.to_wire(domain_object))
+        domain_object = loads(response.content)
+        self.__cache(list_path, domain_object)
+        self.__invalidate_disk_cache(list_path)
         return domain_object
 
     def put_domain_object(self, list_path, domain_object, params=None, version='v1'):
@@ -87,30 +271,140 @@ class SampleClient(object):
             domain_object['id'] = str(uuid.uuid4())
 
         url = self.get_url(list_path, params=params, domain_object_id=domain_object_id, version=version)
-        response = self.rest_client.put(url, data=domain_object)
-        domain_object = json.loads(response.text)
+        response = self.rest_client.put(url, data=SampleClient.to_wire(domain_object))
+        domain_object = loads(response.content)
+        self.__cache(list_path, domain_object)
+        self.__invalidate_disk_cache(list_path)
         return domain_object
 
+    # Posts/puts every domain object on `workers` threads with at most `window` requests queued; returns one
+    # BulkResult per object in input order. Size the RestClient pool_maxsize to at least `workers`.
+    def bulk_post(self, list_path, domain_objects, workers=8, window=None, progress=None, params=None,
+                  version='v1'):
+        return run_bulk(lambda domain_object: self.post_domain_object(list_path, domain_object, params=params,
+                                                                      version=version),
+                        domain_objects, workers=workers, window=window, progress=progress)
+
+    def bulk_put(self, list_path, domain_objects, workers=8, window=None, progress=None, params=None,
+                 version='v1'):
+        return run_bulk(lambda domain_object: self.put_domain_object(list_path, domain_object, params=params,
+                                                                     version=version),
+                        domain_objects, workers=workers, window=window, progress=progress)
+
     def delete(self, list_path, params=None, version='v1'):
         url = self.get_url(list_path, params=params, version=version)
         self.rest_client.delete(url)
+        if self.identity_cache is not None:
+            self.identity_cache.invalidate(list_path)
+        self.__invalidate_disk_cache(list_path)
 
     def delete_domain_object_by_id(self, list_path, domain_object_id, params=None, version='v1'):
         url = self.get_url(list_path, params=params, domain_object_id=domain_object_id, version=version)
         self.rest_client.delete(url)
+        if self.identity_cache is not None:
+            self.identity_cache.invalidate(list_path, domain_object_id)
+        self.__invalidate_disk_cache(list_path)
 
-    def import_file(self, path, filename, file_content=None, params=None, domain_object=None):
-        url = self.get_url(path, params=params, with_token=True)
+    def __cache(self, list_path, domain_object):
+        if self.identity_cache is not None and isinstance(domain_object, dict):
+            self.identity_cache.put(list_path, domain_object)
 
-        multipart_data = {}
+    def __invalidate_disk_cache(self, list_path):
+        if self.disk_cache is not None and list_path in self.disk_cache_list_paths:
+            self.disk_cache.invalidate(self.base_url, list_path)
+
+    # The file is streamed from disk; file_content may be str/bytes, a binary file object or an iterable of chunks
+    def import_file(self, path, filename, file_content=None, params=None, domain_object=None):
         if file_content is None:
-            multipart_data['file'] = (ntpath.basename(filename), open(filename, mode='rb'))
-        else:
-            multipart_data['file'] = (filename, file_content)
+            with open(filename, mode='rb') as file_object:
+                return self.import_file(path, ntpath.basename(filename), file_object, params=params,
+                                        domain_object=domain_object)
+
+        url = self.get_url(path, params=params, with_token=True)
+        multipart_data = {'file': (filename, file_content)}
         if domain_object is not None:
             multipart_data['domainObject'] = domain_object
 
-        return self.rest_client.post_file(url, files=multipart_data)
+        return self.rest_client.post_multipart(url, MultipartEncoder(multipart_data))
+
+    # Splits a large CSV (a path or an iterable of lines) into chunks of rows_per_chunk rows that each repeat the
+    # header, imports the chunks concurrently and merges their import reports. Failed chunks are listed under
+    # 'chunks' in the returned report instead of aborting the import.
+    def import_csv_in_chunks(self, path, csv_file, rows_per_chunk=10000, params=None, workers=4, header_rows=1,
+                             filename=None, progress=None):
+        if isinstance(csv_file, str):
+            with open(csv_file, mode='r', newline='', encoding='utf-8') as lines:
+                return self.import_csv_in_chunks(path, lines, rows_per_chunk=rows_per_chunk, params=params,
+                                                 workers=workers, header_rows=header_rows,
+                                                 filename=filename or ntpath.basename(csv_file), progress=progress)
+
+        filename = filename or 'observations_data.csv'
+        results = run_bulk(
+            lambda indexed_chunk: self.import_file(path, filename, file_content=indexed_chunk[1], params=params),
+            enumerate(split_csv(csv_file, rows_per_chunk, header_rows=header_rows)),
+            workers=workers, window=workers, progress=progress)
+
+        reports = []
+        failed_chunks = []
+        for bulk_result in results:
+            if bulk_result.ok:
+                reports.append(SampleClient.get_import_report(bulk_result.result))
+            else:
+                failed_chunks.append({'chunk': bulk_result.index, 'error': str(bulk_result.error)})
+        report = merge_import_reports(reports)
+        report['chunks'] = {'total': len(results), 'failed': failed_chunks}
+        return report
+
+    # Incremental import of an observations CSV (str or lines) for one sampling location: its rows are compared with
+    # the {row key: fingerprint} of the last sync, the observations of changed and removed rows are deleted and only
+    # new and changed rows are imported. Returns (fingerprints, summary); keep the fingerprints for the next sync.
+    # When the import reports errors they are listed in summary['import_errors'] and the uploaded rows are left
+    # unfingerprinted, so the next sync retries them.
+    def sync_csv_observations(self, sampling_location_id, csv_file, previous_fingerprints, params=None, workers=8,
+                              filename='observations_data.csv'):
+        default_offset_hours = (params or {}).get('timeZoneOffset', None)
+        lines = csv_file.splitlines(True) if isinstance(csv_file, str) else csv_file
+        header, rows = fingerprint_csv(lines, default_offset_hours=default_offset_hours)
+        fingerprints = dict((key, fingerprint) for key, (fingerprint, _) in rows.items())
+        plan = diff_fingerprints(previous_fingerprints, fingerprints)
+
+        # Rows sharing a key map to the same server observations, so they are replaced together
+        stale_base_keys = set(get_base_key(key) for key in plan['changed'] | plan['removed'])
+        upload_keys = [key for key in rows if key in plan['new'] or get_base_key(key) in stale_base_keys]
+
+        observation_ids = []
+        if stale_base_keys:
+            observation_ids = [observation['id'] for observation in self.iter_domain_objects(
+                'observations', {'samplingLocationIds': sampling_location_id})
+                if get_observation_key(observation, default_offset_hours) in stale_base_keys]
+            results = run_bulk(lambda observation_id: self.delete_domain_object_by_id('observations', observation_id),
+                               observation_ids, workers=workers)
+            errors = [str(bulk_result.error) for bulk_result in results if not bulk_result.ok]
+            if errors:
+                raise RuntimeError('failed to delete {0} changed observations of sampling location {1}: {2}'.format(
+                    len(errors), sampling_location_id, '; '.join(errors)))
+
+        import_errors = []
+        if upload_keys:
+            response = self.import_file('services/import/observations', filename,
+                                        header + [rows[key][1] for key in upload_keys], params=params)
+            import_errors = SampleClient.get_import_errors(response)
+            if import_errors:
+                # The report does not tell which rows were imported, so the uploaded rows keep no fingerprint: the
+                # next sync deletes whatever of them made it to the server and imports them again
+                for key in upload_keys:
+                    fingerprints[key] = None
+
+        summary = {
+            'new': len(plan['new']),
+            'changed': len(plan['changed']),
+            'removed': len(plan['removed']),
+            'unchanged': plan['unchanged'],
+            'uploaded_rows': len(upload_keys),
+            'deleted_observations': len(observation_ids),
+            'import_errors': import_errors
+        }
+        return fingerprints, summary
 
     '''Specific domain object methods'''
 
@@ -146,25 +440,53 @@ class SampleClient(object):
             self.logger.debug('Posted Activity %s', activity)
         return activity
 
+    # Brings the settings, samplingLocationMappings and observationMappings of exchange_configuration (as read from
+    # the server) to the desired ones with at most one PUT. Returns the resulting exchange configuration and the diff
+    # ({section: {'added': [...], 'removed': [...]}}); nothing is written when they already match.
+    def update_exchange_configuration(self, exchange_configuration, desired):
+        diff = diff_exchange_configuration(exchange_configuration, desired)
+        if not has_changes(diff):
+            return exchange_configuration, diff
+        exchange_configuration = self.put_domain_object(
+            'exchangeconfigurations', merge_exchange_configuration(exchange_configuration, desired))
+        return exchange_configuration, diff
+
     def delete_observations(self, params):
         url = self.get_url('observations', params=params)
-        return self.rest_client.delete(url)
-
-    def delete_field_visits_by_sampling_location_id(self, sampling_location_id):
-        search_result = self.get_search_result('fieldvisits', {
-            'samplingLocationIds': sampling_location_id
-        })
-        for field_visit in search_result['domainObjects']:
-            self.delete_activities_by_field_visit_id(field_visit['id'])
-            self.delete_domain_object_by_id('fieldvisits', field_visit['id'])
-
+        response = self.rest_client.delete(url)
+        if self.identity_cache is not None:
+            self.identity_cache.invalidate('observations')
+        return response
+
+    # Returns the CascadeDeleter summary (counts and timings per level)
+    def delete_field_visits_by_sampling_location_id(self, sampling_location_id, workers=8):
+        summary = CascadeDeleter(self, workers=workers).delete_sampling_location(
+            sampling_location_id, delete_sampling_location=False)
+        if summary['errors']:
+            raise RuntimeError('failed to delete field visits of sampling location {0}: {1}'.format(
+                sampling_location_id, '; '.join(summary['errors'])))
+        return summary
+
+    # Ids are collected before deleting so the deletes don't shift the pages still being read
     def delete_activities_by_field_visit_id(self, field_visit_id):
-        search_result = self.get_search_result('activities', {'fieldVisitId': field_visit_id})
-        for activity in search_result['domainObjects']:
-            self.delete_domain_object_by_id('activities', activity['id'])
+        activity_ids = [activity['id'] for activity in self.iter_domain_objects(
+            'activities', {'fieldVisitId': field_visit_id})]
+        for activity_id in activity_ids:
+            self.delete_domain_object_by_id('activities', activity_id)
 
     '''Static methods'''
 
+    # (verify, cert) to set on the RestClient of a tenant, None where the RestClient default applies
+    @staticmethod
+    def get_tls_settings(base_url):
+        if 'debug.gaiaserve.net' in base_url:
+            return '../resources/gaia-sm-ca-chain.cert.pem', None
+        elif '.gaiaserve.net' in base_url:
+            return True, ('../resources/gaiaserve-net.cert.pem', '../resources/gaiaserve-net.key.pem')
+        elif '.aqsamples.com' in base_url:
+            return True, None
+        return None, None
+
     @staticmethod
     def url_join(base_url, *paths):
         url = base_url
@@ -172,6 +494,68 @@ class SampleClient(object):
             url = url + path if url.endswith('/') else url + '/' + path
         return url
 
+    @staticmethod
+    def get_next_page_params(params, page, page_length=None):
+        cursor = page.get('cursor', None)
+        if cursor:
+            if cursor == params.get('cursor', None):
+                return None
+            next_params = dict(params)
+            next_params['cursor'] = cursor
+            return next_params
+        if 'cursor' in params:
+            return None
+
+        total_count = page.get('totalCount', None)
+        if page_length is None:
+            page_length = len(page.get('domainObjects', []))
+        next_start = int(params.get('start', 0)) + page_length
+        if total_count is None or next_start >= total_count:
+            return None
+        next_params = dict(params)
+        next_params['start'] = next_start
+        return next_params
+
+    @staticmethod
+    def iter_response_content(response, chunk_size):
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        finally:
+            response.close()
+
+    @staticmethod
+    def get_import_report(response):
+        if not response.content:
+            return {}
+        try:
+            report = loads(response.content)
+        except ValueError:
+            return {'message': response.text}
+        return report if isinstance(report, dict) else {'items': report}
+
+    # The errors of an import, empty when every row was imported. A 409 without an errorCode gets past
+    # RestClient.handle_error, so the status is checked here as well as the report.
+    @staticmethod
+    def get_import_errors(response):
+        report = SampleClient.get_import_report(response)
+        errors = list(report.get('errors', None) or [])
+        error_count = report.get('errorCount', 0) or 0
+        if not errors and (error_count or response.status_code == 409):
+            errors = [report.get('message', None) or 'status {0} with {1} errors'.format(
+                response.status_code, error_count)]
+        return errors
+
+    # The dict to send for a domain object given as a model or as a dict that embeds models
+    @staticmethod
+    def to_wire(domain_object):
+        if isinstance(domain_object, DomainObject):
+            return domain_object.to_dict()
+        if isinstance(domain_object, dict) and any(isinstance(value, DomainObject) for value in domain_object.values()):
+            return dict((key, value.to_dict() if isinstance(value, DomainObject) else value)
+                        for key, value in domain_object.items())
+        return domain_object
+
     @staticmethod
     def get_overrides_value(overrides, key, default_value):
         return default_value if key not in overrides else overrides[key]
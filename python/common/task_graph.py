@@ -0,0 +1,130 @@
+import concurrent.futures
+import time
+
+from .common_logging import CommonLogging
+
+
+class _Task(object):
+    def __init__(self, name, func, depends_on):
+        self.name = name
+        self.func = func
+        self.depends_on = depends_on
+        self.state = TaskGraph.PENDING
+        self.result = None
+        self.error = None
+        self.ready = None
+        self.started = None
+        self.finished = None
+
+
+# Runs operations as soon as the operations they depend on are done, up to `workers` at a time. A task is added
+# with the names of the tasks it needs and is called with their results as positional arguments, in that order:
+#   graph.add('field_visit', lambda: sample_client.get_or_create_field_visit(...))
+#   graph.add('activity', lambda field_visit: sample_client.get_or_create_activity({'fieldVisit': field_visit, ...}),
+#             depends_on=['field_visit'])
+# Dependencies must be added first, so the graph cannot have cycles. A failed task skips everything that depends on
+# it; run() raises once every other task has finished. get_critical_path() tells which chain decided the run time.
+class TaskGraph(object):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, workers=8):
+        self.logger = CommonLogging.get_logger("TaskGraph")
+        self.workers = workers
+        self.tasks = {}
+        self.started = None
+        self.finished = None
+
+    def add(self, name, func, depends_on=()):
+        if name in self.tasks:
+            raise RuntimeError('task {0} is already defined'.format(name))
+        unknown = [dependency for dependency in depends_on if dependency not in self.tasks]
+        if unknown:
+            raise RuntimeError('task {0} depends on undefined tasks {1}'.format(name, ', '.join(unknown)))
+        self.tasks[name] = _Task(name, func, list(depends_on))
+        return name
+
+    # Returns {name: result}
+    def run(self):
+        self.started = time.monotonic()
+        pending = dict(self.tasks)
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='TaskGraph') \
+                as executor:
+            while pending or running:
+                for task in list(pending.values()):
+                    dependencies = [self.tasks[dependency] for dependency in task.depends_on]
+                    if any(dependency.state in (TaskGraph.FAILED, TaskGraph.SKIPPED) for dependency in dependencies):
+                        task.state = TaskGraph.SKIPPED
+                        del pending[task.name]
+                    elif all(dependency.state == TaskGraph.DONE for dependency in dependencies):
+                        task.ready = time.monotonic()
+                        running[executor.submit(self.__call, task, [dependency.result
+                                                                    for dependency in dependencies])] = task
+                        del pending[task.name]
+                if not running:
+                    continue
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        task.result = future.result()
+                        task.state = TaskGraph.DONE
+                    except Exception as error:
+                        task.error = error
+                        task.state = TaskGraph.FAILED
+                        self.logger.error('task %s failed: %s', task.name, error)
+        self.finished = time.monotonic()
+
+        failed = [task for task in self.tasks.values() if task.state == TaskGraph.FAILED]
+        if failed:
+            skipped = [task.name for task in self.tasks.values() if task.state == TaskGraph.SKIPPED]
+            raise RuntimeError('{0} of {1} tasks failed ({2}){3}'.format(
+                len(failed), len(self.tasks), '; '.join('{0}: {1}'.format(task.name, task.error) for task in failed),
+                ', skipped {0}'.format(', '.join(skipped)) if skipped else ''))
+        return dict((name, task.result) for name, task in self.tasks.items())
+
+    @staticmethod
+    def __call(task, arguments):
+        task.started = time.monotonic()
+        try:
+            return task.func(*arguments)
+        finally:
+            task.finished = time.monotonic()
+
+    # The chain of tasks ending with the one that finished last, each preceded by the dependency it waited for
+    # longest. 'queued' is the time a task was ready but waited for a free worker.
+    def get_critical_path(self):
+        finished_tasks = [task for task in self.tasks.values() if task.finished is not None]
+        task = max(finished_tasks, key=lambda finished_task: finished_task.finished) if finished_tasks else None
+        path = []
+        while task is not None:
+            path.append({
+                'name': task.name,
+                'state': task.state,
+                'seconds': task.finished - task.started,
+                'queued': task.started - task.ready
+            })
+            dependencies = [self.tasks[dependency] for dependency in task.depends_on
+                            if self.tasks[dependency].finished is not None]
+            task = max(dependencies, key=lambda dependency: dependency.finished) if dependencies else None
+        path.reverse()
+        return path
+
+    def get_report(self):
+        return {
+            'seconds': self.finished - self.started if self.finished is not None else None,
+            'critical_path': self.get_critical_path(),
+            'tasks': dict((task.name, {
+                'state': task.state,
+                'depends_on': task.depends_on,
+                'start': task.started - self.started if task.started is not None else None,
+                'seconds': task.finished - task.started if task.finished is not None else None
+            }) for task in self.tasks.values())
+        }
+
+    # E.g. 'locations 41.20s -> exchange_configuration 0.35s'
+    def format_critical_path(self):
+        return ' -> '.join('{0} {1:.2f}s'.format(step['name'], step['seconds']) for step in self.get_critical_path())
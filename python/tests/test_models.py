@@ -0,0 +1,54 @@
+import copy
+import json
+import pickle
+import unittest
+
+from python.common.models import Activity
+
+
+class ModelTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = {'id': '1', 'customId': 'c', 'fieldVisit': {'id': 'f', 'samplingLocation': {'id': 'l'}},
+                'comment': 'old', 'unknownMember': [1, 2]}
+        activity = Activity.from_dict(data, {})
+        self.assertEqual(data, activity.to_dict())
+        self.assertEqual(list(data), list(activity.to_dict()))
+
+    def test_assigned_member_round_trips(self):
+        activity = Activity.from_dict({'id': '1', 'customId': 'c', 'comment': 'old'}, {})
+        activity.comment = 'new'
+        self.assertEqual('new', activity.to_dict()['comment'])
+        self.assertEqual('c', activity.get('customId'))
+        self.assertEqual('new', activity.comment)
+
+    def test_assigned_new_member_round_trips(self):
+        activity = Activity.from_dict({'id': '1', 'customId': 'c'}, {})
+        activity.medium = 'Water'
+        self.assertEqual({'id': '1', 'customId': 'c', 'medium': 'Water'}, activity.to_dict())
+
+    def test_shared_embedded_objects(self):
+        shared = {}
+        field_visit = {'id': 'f', 'samplingLocation': {'id': 'l'}}
+        first = Activity.from_dict({'id': '1', 'fieldVisit': dict(field_visit)}, shared)
+        second = Activity.from_dict({'id': '2', 'fieldVisit': dict(field_visit)}, shared)
+        self.assertIs(first.fieldVisit, second.fieldVisit)
+
+    def test_pickle_round_trip(self):
+        data = {'id': '1', 'customId': 'c', 'fieldVisit': {'id': 'f', 'samplingLocation': {'id': 'l'}},
+                'unknownMember': [1, 2]}
+        for activity in (Activity.from_dict(data, {}), Activity.from_json(json.dumps(data))):
+            self.assertEqual(data, pickle.loads(pickle.dumps(activity)).to_dict())
+            activity.comment = 'new'
+            self.assertEqual('new', pickle.loads(pickle.dumps(activity)).comment)
+
+    def test_deepcopy_round_trip(self):
+        data = {'id': '1', 'customId': 'c', 'fieldVisit': {'id': 'f', 'samplingLocation': {'id': 'l'}}}
+        for activity in (Activity.from_dict(data, {}), Activity.from_json(json.dumps(data))):
+            copied = copy.deepcopy(activity)
+            self.assertEqual(data, copied.to_dict())
+            copied.customId = 'd'
+            self.assertEqual('c', activity.customId)
+
+
+if __name__ == '__main__':
+    unittest.main()
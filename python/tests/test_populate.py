@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from python.Benchmarks.mock_server import MockSamplesServer
+from python.common.client_registry import ClientRegistry
+from python.common.observation_sync import ObservationManifest
+from python.PopulateConnectorData.populate import ConnectorPropagator
+
+HEADER = 'Location ID,Sample ID,Observed Property ID,Observed DateTime,Result Value\n'
+
+
+def make_csv(rows):
+    return HEADER + ''.join('L1,S{0},pH,2020-01-0{0}T10:00:00,{1}\n'.format(day, value) for day, value in rows)
+
+
+class PopulateObservationsTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockSamplesServer().start()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manifest = ObservationManifest(os.path.join(self.temp_dir.name, 'manifest.json'))
+        self.propagator = ConnectorPropagator('token', self.server.base_url, workers=2)
+        self.propagator.set_observation_manifest(self.manifest)
+        self.sampling_location = self.server.create('samplinglocations', {'customId': 'L1'})
+
+    def tearDown(self):
+        ClientRegistry.get_default().close()
+        self.temp_dir.cleanup()
+        self.server.stop()
+
+    def get_fingerprints(self):
+        return self.manifest.get(self.server.base_url, self.sampling_location['id'])
+
+    def test_manifest_follows_the_imports(self):
+        self.propagator.populate_observations(self.sampling_location, make_csv([(1, 7.0), (2, 7.1)]))
+        self.assertEqual(2, len(self.get_fingerprints()))
+        self.assertEqual(2, len(self.server.lists['observations']))
+
+        with self.assertRaises(RuntimeError):
+            self.propagator.populate_observations(self.sampling_location, make_csv([(1, 7.0), (2, 'n/a')]))
+        self.assertEqual([None], [fingerprint for fingerprint in self.get_fingerprints().values()
+                                  if fingerprint is None])
+
+        self.propagator.populate_observations(self.sampling_location, make_csv([(1, 7.0), (2, 7.2)]))
+        self.assertNotIn(None, self.get_fingerprints().values())
+        self.assertEqual(['7.0', '7.2'], sorted(observation['numericResult']['value'] for observation
+                                                in self.server.lists['observations'].values()))
+
+    def test_failed_full_import_drops_the_manifest_entry(self):
+        with self.assertRaises(RuntimeError):
+            self.propagator.populate_observations(self.sampling_location, make_csv([(1, 7.0), (2, 'n/a')]))
+        self.assertIsNone(self.get_fingerprints())
+
+
+if __name__ == '__main__':
+    unittest.main()
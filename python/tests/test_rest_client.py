@@ -0,0 +1,97 @@
+import unittest
+
+from python.Benchmarks.mock_server import MockSamplesServer
+from python.common.http_cache import HttpCache
+from python.common.rest_client import RestClient
+from python.common.retry import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+class RestClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockSamplesServer().start()
+        self.rest_client = RestClient()
+        self.status_url = self.server.base_url + 'v1/status'
+
+    def tearDown(self):
+        self.rest_client.close()
+        self.server.stop()
+
+    def test_retries_failed_requests(self):
+        retry_policy = RetryPolicy(max_attempts=3, backoff_factor=0, jitter=False)
+        self.rest_client.set_retry_policy(retry_policy)
+        self.server.error_rate = 1.0
+        with self.assertRaises(RuntimeError):
+            self.rest_client.get(self.status_url)
+        self.assertEqual(3, self.server.request_count)
+        self.assertEqual(2, retry_policy.retries)
+
+        self.server.error_rate = 0.0
+        self.assertEqual(200, self.rest_client.get(self.status_url).status_code)
+
+    def test_circuit_breaker_opens_and_probes(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.rest_client.set_retry_policy(RetryPolicy(max_attempts=1, circuit_breaker=circuit_breaker))
+        self.server.error_rate = 1.0
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.rest_client.get(self.status_url)
+        with self.assertRaises(CircuitOpenError):
+            self.rest_client.get(self.status_url)
+        self.assertEqual(2, self.server.request_count)
+        self.assertEqual(CircuitBreaker.OPEN, circuit_breaker.state)
+
+        self.server.error_rate = 0.0
+        circuit_breaker.opened_at -= 60
+        self.assertEqual(200, self.rest_client.get(self.status_url).status_code)
+        self.assertEqual(CircuitBreaker.CLOSED, circuit_breaker.state)
+
+    def test_failing_hook_releases_the_probe(self):
+        circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        self.rest_client.set_retry_policy(RetryPolicy(max_attempts=1, circuit_breaker=circuit_breaker))
+        self.server.error_rate = 1.0
+        with self.assertRaises(RuntimeError):
+            self.rest_client.get(self.status_url)
+        self.server.error_rate = 0.0
+
+        def fail(method, url, attempt):
+            raise KeyError(url)
+
+        self.rest_client.add_hook('before_request', fail)
+        with self.assertRaises(KeyError):
+            self.rest_client.get(self.status_url)
+        self.rest_client.remove_hook('before_request', fail)
+        self.assertEqual(200, self.rest_client.get(self.status_url).status_code)
+
+    def test_not_modified_is_served_from_cache(self):
+        http_cache = HttpCache()
+        self.rest_client.set_http_cache(http_cache)
+        url = self.server.base_url + 'v1/observedproperties'
+        first = self.rest_client.get(url)
+        second = self.rest_client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(1, http_cache.hits)
+        self.assertEqual(2, self.server.request_count)
+
+    def test_compressed_body(self):
+        self.rest_client.set_request_compression(min_size=10)
+        response = self.rest_client.post(self.server.base_url + 'v1/units', data={'customId': 'x' * 100})
+        self.assertEqual('x' * 100, response.json()['customId'])
+        self.assertEqual(1, self.server.request_count)
+        self.assertEqual(10, self.rest_client.request_compression_min_size)
+
+    def test_compression_falls_back_on_415(self):
+        self.server.accept_gzip = False
+        self.rest_client.set_request_compression(min_size=10)
+        url = self.server.base_url + 'v1/units'
+        response = self.rest_client.post(url, data={'customId': 'x' * 100})
+        self.assertEqual('x' * 100, response.json()['customId'])
+        self.assertEqual(2, self.server.request_count)
+        self.assertIsNone(self.rest_client.request_compression_min_size)
+
+        self.rest_client.post(url, data={'customId': 'y' * 100})
+        self.assertEqual(3, self.server.request_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
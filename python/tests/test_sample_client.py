@@ -0,0 +1,91 @@
+import unittest
+
+from python.Benchmarks.mock_server import MockSamplesServer
+from python.common.cascade_delete import CascadeDeleter
+from python.common.rest_client import RestClient
+from python.common.sample_client import SampleClient
+
+HEADER = 'Sample ID,Observed Property ID,Observed DateTime,Result Value\n'
+
+
+def make_csv(rows):
+    return HEADER + ''.join('S{0},pH,2020-01-0{0}T10:00:00,{1}\n'.format(day, value) for day, value in rows)
+
+
+class SampleClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockSamplesServer().start()
+        self.sample_client = SampleClient('token', self.server.base_url, RestClient())
+        self.sampling_location = self.server.create('samplinglocations', {'customId': 'L1'})
+
+    def tearDown(self):
+        self.sample_client.close()
+        self.server.stop()
+
+    def test_custom_ids_are_chunked(self):
+        custom_ids = ['property-{0:04d}'.format(index) for index in range(60)]
+        for custom_id in custom_ids[:50]:
+            self.server.create('observedproperties', {'customId': custom_id})
+        domain_objects = self.sample_client.get_domain_objects_by_custom_ids('observedproperties', custom_ids,
+                                                                             max_url_length=600)
+        self.assertEqual(custom_ids, list(domain_objects))
+        self.assertEqual(custom_ids[:50], [custom_id for custom_id, domain_object in domain_objects.items()
+                                           if domain_object is not None])
+        # Several chunked searches, then one lookup per unused id
+        self.assertLess(self.server.request_count, 50)
+        self.assertGreater(self.server.request_count, 11)
+        with self.assertRaises(RuntimeError):
+            self.sample_client.get_domain_objects_by_custom_ids('observedproperties', custom_ids,
+                                                                raise_error_when_custom_id_is_unused=True)
+
+    def test_cascade_delete(self):
+        for _ in range(3):
+            field_visit = self.server.create('fieldvisits', {'samplingLocation': {'id': self.sampling_location['id']}})
+            for _ in range(2):
+                self.server.create('activities', {'fieldVisit': {'id': field_visit['id']}})
+        summary = CascadeDeleter(self.sample_client, workers=4).delete_sampling_location(self.sampling_location['id'])
+        self.assertEqual([], summary['errors'])
+        self.assertEqual(6, summary['activities']['deleted'])
+        self.assertEqual(3, summary['fieldvisits']['deleted'])
+        self.assertEqual(1, summary['samplinglocations']['deleted'])
+        self.assertEqual({}, self.server.lists['activities'])
+        self.assertEqual({}, self.server.lists['fieldvisits'])
+        self.assertEqual({}, self.server.lists['samplinglocations'])
+
+    def test_sync_observations(self):
+        params = {'samplingLocationIds': self.sampling_location['id']}
+        fingerprints, summary = self.sample_client.sync_csv_observations(
+            self.sampling_location['id'], make_csv([(1, 7.0), (2, 7.1), (3, 7.2)]), {}, params=params)
+        self.assertEqual(3, summary['new'])
+        self.assertEqual(3, len(self.server.lists['observations']))
+
+        fingerprints, summary = self.sample_client.sync_csv_observations(
+            self.sampling_location['id'], make_csv([(1, 7.0), (2, 8.1), (4, 7.3)]), fingerprints, params=params)
+        self.assertEqual((1, 1, 1, 1), (summary['new'], summary['changed'], summary['removed'], summary['unchanged']))
+        self.assertEqual(2, summary['uploaded_rows'])
+        self.assertEqual(2, summary['deleted_observations'])
+        self.assertEqual([], summary['import_errors'])
+        self.assertEqual(['7.0', '7.3', '8.1'], sorted(observation['numericResult']['value'] for observation
+                                                       in self.server.lists['observations'].values()))
+
+    def test_sync_keeps_failed_rows_unfingerprinted(self):
+        params = {'samplingLocationIds': self.sampling_location['id']}
+        fingerprints, _ = self.sample_client.sync_csv_observations(
+            self.sampling_location['id'], make_csv([(1, 7.0)]), {}, params=params)
+
+        fingerprints, summary = self.sample_client.sync_csv_observations(
+            self.sampling_location['id'], make_csv([(1, 7.0), (2, 'n/a'), (3, 7.2)]), fingerprints, params=params)
+        self.assertEqual(1, len(summary['import_errors']))
+        self.assertEqual(2, sum(1 for fingerprint in fingerprints.values() if fingerprint is None))
+        self.assertEqual(2, len(self.server.lists['observations']))
+
+        # The rows of the failed import are replaced, not imported twice
+        fingerprints, summary = self.sample_client.sync_csv_observations(
+            self.sampling_location['id'], make_csv([(1, 7.0), (2, 7.1), (3, 7.2)]), fingerprints, params=params)
+        self.assertEqual([], summary['import_errors'])
+        self.assertNotIn(None, fingerprints.values())
+        self.assertEqual(3, len(self.server.lists['observations']))
+
+
+if __name__ == '__main__':
+    unittest.main()